@@ -0,0 +1,155 @@
+"""
+Recall vs memory / latency of the compact embedding storage : shortened embeddings (`dimensions` of the
+text-embedding-3 models) scanned as float32 / int8 / binary codes (src/vector_index.py), with
+and without full-precision rescoring of the top candidates. The SAMPLE_TICKETS are searched in the
+KB_ARTICLES and compared to the exact top k of the native full-precision embeddings.
+
+    python -m benchmarks.embedding_quantization
+    python -m benchmarks.embedding_quantization --dimensions 1536 512 256 --quantizations int8 binary --rescore 0 10
+    python -m benchmarks.embedding_quantization --corpus-size 100000 --min-recall 0.95
+
+The embeddings come from the shared OpenAI client, through the embedding cache (one request per size,
+free on the next runs). --fake uses deterministic random embeddings instead : no network, only the
+memory / latency columns are meaningful then. --corpus-size pads the index with random unit vectors to
+time the scan at a realistic size (they stay out of the top k of the tickets).
+
+Columns : recall@k (share of the exact top k found), category@1 (best article of the expected
+category), bytes per vector scanned (codes) and kept for rescoring (full), latency per query (µs).
+"""
+from typing import Dict, List, Optional
+import argparse
+import time
+
+import numpy as np
+
+from src import clients
+from src.batch_embeddings import embed_batches
+from src.config import EMBEDDING_MODEL, OPENAI_API_KEY
+from src.data.knowledge_base import KB_ARTICLES
+from src.data.sample_tickets import SAMPLE_TICKETS
+from src.tools.centroid_categorizer import article_text, ticket_text
+from src.vector_index import QUANTIZATIONS, QuantizedIndex, normalize
+
+NATIVE_DIMENSION = 1536  # text-embedding-3-small
+
+
+def embed(client, texts: List[str], dimension: int) -> np.ndarray:
+    """Unit embeddings of texts at a size (the native size is requested without `dimensions`)"""
+    dimensions = None if dimension == NATIVE_DIMENSION else dimension
+    return normalize(embed_batches(client, EMBEDDING_MODEL, texts, dimensions=dimensions))
+
+
+def padded(vectors: np.ndarray, corpus_size: int, seed: int = 0) -> np.ndarray:
+    """vectors followed by random unit vectors up to corpus_size rows"""
+    extra = corpus_size - len(vectors)
+    if extra <= 0:
+        return vectors
+    rng = np.random.default_rng(seed)
+    return np.vstack([vectors, normalize(rng.standard_normal((extra, vectors.shape[1]), dtype=np.float32))])
+
+
+def evaluate(
+    index: QuantizedIndex,
+    queries: np.ndarray,
+    reference: List[List[int]],
+    k: int,
+    rescore: int,
+    iterations: int
+) -> Dict:
+    """recall@k against the reference top k, category@1 and mean latency per query (µs)"""
+    found, category_hits = 0, 0
+    for query, expected, ticket in zip(queries, reference, SAMPLE_TICKETS):
+        results = [i for i, _ in index.search(query, k=k, rescore=rescore)]
+        found += len(set(results) & set(expected))
+        best = results[0] if results else None
+        if best is not None and best < len(KB_ARTICLES) and KB_ARTICLES[best]["category"] == ticket["expected_category"]:
+            category_hits += 1
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for query in queries:
+            index.search(query, k=k, rescore=rescore)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "recall": found / (k * len(queries)),
+        "category_at_1": category_hits / len(queries),
+        "latency_us": elapsed / (iterations * len(queries)) * 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs memory / latency of the compact embedding storage")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1536, 1024, 512, 256], help="embedding sizes")
+    parser.add_argument("--quantizations", nargs="+", default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 10], help="candidates rescored at full precision")
+    parser.add_argument("--k", type=int, default=3, help="articles retrieved per ticket")
+    parser.add_argument("--corpus-size", type=int, default=0, help="pad the index with random vectors up to this size")
+    parser.add_argument("--iterations", type=int, default=20, help="timed passes over the tickets")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="recall@k of the recommended setting")
+    parser.add_argument("--fake", action="store_true", help="random embeddings, no API call")
+    args = parser.parse_args()
+
+    if args.fake:
+        from benchmarks.fake_clients import FakeOpenAI
+        client = FakeOpenAI()
+    else:
+        client = clients.openai_client(OPENAI_API_KEY)
+
+    articles = [article_text(article) for article in KB_ARTICLES]
+    tickets = [ticket_text(ticket) for ticket in SAMPLE_TICKETS]
+
+    # Exact top k of the native full-precision embeddings
+    native_articles = embed(client, articles, NATIVE_DIMENSION)
+    native_tickets = embed(client, tickets, NATIVE_DIMENSION)
+    k = min(args.k, len(articles))
+    reference = [list(np.argsort(-(native_articles @ query))[:k]) for query in native_tickets]
+
+    rows = []
+    for dimension in args.dimensions:
+        article_vectors = native_articles if dimension == NATIVE_DIMENSION else embed(client, articles, dimension)
+        ticket_vectors = native_tickets if dimension == NATIVE_DIMENSION else embed(client, tickets, dimension)
+        vectors = padded(article_vectors, args.corpus_size)
+        for quantization in args.quantizations:
+            index = QuantizedIndex(vectors, quantization=quantization)
+            # Rescoring only applies to the compact codes
+            for rescore in ([0] if quantization == "none" else args.rescore):
+                memory = index.memory()
+                rows.append({
+                    "dimension": dimension,
+                    "quantization": quantization,
+                    "rescore": rescore,
+                    "codes_bytes": memory["codes"] / len(index),
+                    "full_bytes": memory["full"] / len(index) if rescore else 0.0,
+                    **evaluate(index, ticket_vectors, reference, k, rescore, args.iterations)
+                })
+
+    print(f"{len(SAMPLE_TICKETS)} tickets, {len(vectors)} vectors ({len(KB_ARTICLES)} articles), k={k}"
+          f"{' - fake embeddings' if args.fake else ''}\n")
+    print(f"{'dim':>5} {'codes':<8} {'rescore':>7} {'recall@k':>9} {'cat@1':>6} {'B/vec':>7} {'full B/vec':>10} {'µs/query':>9}")
+    print("-" * 68)
+    for row in rows:
+        print(
+            f"{row['dimension']:>5} {row['quantization']:<8} {row['rescore']:>7} {row['recall']:>9.3f} "
+            f"{row['category_at_1']:>6.2f} {row['codes_bytes']:>7.0f} {row['full_bytes']:>10.0f} {row['latency_us']:>9.1f}"
+        )
+
+    best = recommend(rows, args.min_recall)
+    if best is None:
+        print(f"\nNo setting reaches recall@{k} >= {args.min_recall}")
+    else:
+        print(
+            f"\nSmallest scanned footprint with recall@{k} >= {args.min_recall}: EMBEDDING_DIMENSIONS={best['dimension']} "
+            f"EMBEDDING_QUANTIZATION={best['quantization']} RESCORE_CANDIDATES={best['rescore']} "
+            f"({best['codes_bytes']:.0f} B/vector instead of {NATIVE_DIMENSION * 4})"
+        )
+
+
+def recommend(rows: List[Dict], min_recall: float) -> Optional[Dict]:
+    """Setting with the fewest scanned bytes per vector reaching min_recall (then the fastest)"""
+    eligible = [row for row in rows if row["recall"] >= min_recall]
+    return min(eligible, key=lambda row: (row["codes_bytes"], row["latency_us"])) if eligible else None
+
+
+if __name__ == "__main__":
+    main()
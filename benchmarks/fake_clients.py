@@ -0,0 +1,372 @@
+"""
+In-process fakes of the OpenAI, Supabase and Together clients : same call shapes as the real
+SDKs (client.chat.completions.create, client.embeddings.create, client.rpc(...).execute()),
+canned responses, and a configurable latency (seconds) per call to simulate the network.
+The answers for the sample tickets follow their expected_category / expected_priority.
+"""
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import hashlib
+import json
+import random
+import time
+
+from src.config import EMBEDDING_DIMENSION, EMBEDDING_MODEL
+from src.data.knowledge_base import KB_ARTICLES
+from src.data.sample_tickets import SAMPLE_TICKETS
+from src.seed_knowledge_base import chroma_metadata, chroma_text
+from src.tools.priority_scorer import SYSTEM_PROMPT as PRIORITY_SYSTEM_PROMPT
+
+
+RESPONSE_TIMES = {"CRITICAL": "< 15 min", "HIGH": "< 1 hour", "MEDIUM": "< 4 hours", "LOW": "< 24 hours"}
+
+RECOMMENDATION = {
+    "immediate_actions": [
+        "Confirm the scope of the issue with the user",
+        "Apply the steps of the most relevant KB article",
+        "Verify the resolution with the user"
+    ],
+    "tools_required": ["Admin console"],
+    "estimated_time": "30 minutes",
+    "escalation_needed": False
+}
+
+
+def _usage(prompt: str, completion: str) -> SimpleNamespace:
+    """Token usage estimated at ~4 characters per token"""
+    return SimpleNamespace(
+        prompt_tokens=len(prompt) // 4,
+        completion_tokens=len(completion) // 4,
+        total_tokens=(len(prompt) + len(completion)) // 4,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=0)
+    )
+
+
+def _completion(content: Optional[str], prompt: str, tool_calls=None) -> SimpleNamespace:
+    message = SimpleNamespace(role="assistant", content=content, tool_calls=tool_calls)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(index=0, message=message, finish_reason="tool_calls" if tool_calls else "stop")],
+        usage=_usage(prompt, content or "")
+    )
+
+
+def _expected(prompt: str) -> Dict:
+    """Expected labels of the sample ticket quoted in the prompt (defaults otherwise)"""
+    for ticket in SAMPLE_TICKETS:
+        if ticket["subject"] in prompt:
+            return ticket
+    return {"expected_category": "SOFTWARE_ISSUES", "expected_priority": "MEDIUM"}
+
+
+class _FakeChatCompletions:
+
+    def __init__(self, owner: "FakeOpenAI"):
+        self.owner = owner
+
+    def create(self, **kwargs):
+        self.owner.calls["chat"] += 1
+        time.sleep(self.owner.latency)
+        return self.owner.respond(**kwargs)
+
+
+class _FakeEmbeddings:
+
+    def __init__(self, owner: "FakeOpenAI"):
+        self.owner = owner
+
+    def create(self, model: str, input, dimensions: Optional[int] = None, **kwargs):
+        self.owner.calls["embeddings"] += 1
+        time.sleep(self.owner.latency)
+        texts = input if isinstance(input, list) else [input]
+        dimension = dimensions or self.owner.dimension
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=fake_embedding(text, dimension)) for i, text in enumerate(texts)],
+            model=model,
+            usage=_usage("".join(texts), "")
+        )
+
+
+def fake_embedding(text: str, dimension: int = EMBEDDING_DIMENSION) -> List[float]:
+    """Deterministic unit vector derived from the text"""
+    seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimension)]
+    norm = sum(value * value for value in vector) ** 0.5
+    return [value / norm for value in vector]
+
+
+class FakeOpenAI:
+    """OpenAI client answering the requests of the categorizer, the priority scorer and the agent"""
+
+    def __init__(self, latency: float = 0.0, dimension: int = EMBEDDING_DIMENSION):
+        self.latency = latency
+        self.dimension = dimension
+        self.calls = {"chat": 0, "embeddings": 0}
+        self.chat = SimpleNamespace(completions=_FakeChatCompletions(self))
+        self.embeddings = _FakeEmbeddings(self)
+        self.models = SimpleNamespace(list=self._list_models)
+
+    def _list_models(self):
+        time.sleep(self.latency)
+        return SimpleNamespace(data=[])
+
+    def respond(self, **kwargs):
+        messages = kwargs.get("messages", [])
+        system = messages[0]["content"] if messages else ""
+        prompt = "\n".join(message["content"] for message in messages)
+        expected = _expected(prompt)
+        response_format = kwargs.get("response_format") or {}
+
+        if kwargs.get("stream"):
+            return self._stream(json.dumps(RECOMMENDATION), prompt)
+
+        # Tool calling loop : call the first tool still offered, stop when none is left
+        if kwargs.get("tools") is not None:
+            tools = kwargs["tools"]
+            if not tools:
+                return _completion("I have all the information needed.", prompt)
+            name = tools[0]["function"]["name"]
+            tool_call = SimpleNamespace(
+                id=f"call_{name}",
+                type="function",
+                function=SimpleNamespace(name=name, arguments="{}")
+            )
+            return _completion(f"I should use {name}.", prompt, tool_calls=[tool_call])
+
+        if response_format.get("type") == "json_schema":
+            priority = expected["expected_priority"]
+            return _completion(json.dumps({
+                "category": expected["expected_category"],
+                "category_confidence": 90,
+                "priority": priority,
+                "response_time": RESPONSE_TIMES[priority],
+                "priority_reasoning": "Canned answer",
+                **RECOMMENDATION
+            }), prompt)
+
+        if system.startswith("You are an IT ticket categorizer"):
+            return _completion(json.dumps({
+                "category": expected["expected_category"],
+                "confidence": 90,
+                "reasoning": "Canned answer",
+                "keywords_detected": []
+            }), prompt)
+
+        if system == PRIORITY_SYSTEM_PROMPT:
+            priority = expected["expected_priority"]
+            return _completion(json.dumps({
+                "priority": priority,
+                "confidence": 85,
+                "response_time": RESPONSE_TIMES[priority],
+                "reasoning": "Canned answer"
+            }), prompt)
+
+        if system.startswith("You are a tool selector"):
+            available = prompt.split("haven't used yet:", 1)[-1].split("Tools already used", 1)[0]
+            names = json.loads(available.strip() or "[]")
+            return _completion(json.dumps({"tool": names[0] if names else None, "reason": "Canned answer"}), prompt)
+
+        if response_format.get("type") == "json_object":
+            return _completion(json.dumps(RECOMMENDATION), prompt)
+
+        return _completion("I need more information, I should use the next available tool.", prompt)
+
+    def _stream(self, content: str, prompt: str, chunk_size: int = 8):
+        for start in range(0, len(content), chunk_size):
+            delta = SimpleNamespace(content=content[start:start + chunk_size], role=None)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], usage=None)
+        yield SimpleNamespace(choices=[], usage=_usage(prompt, content))
+
+
+class _FakeRPC:
+
+    def __init__(self, owner: "FakeSupabase", params: Dict):
+        self.owner = owner
+        self.params = params
+
+    def execute(self):
+        time.sleep(self.owner.latency)
+        return SimpleNamespace(data=self.owner.match(**self.params), count=None)
+
+
+class _FakeTable:
+    """Chainable stand-in of a table query : select / upsert / insert / delete, eq / neq / in_ / order / limit / range"""
+
+    def __init__(self, owner: "FakeSupabase", name: str):
+        self.owner = owner
+        self.rows = owner.tables.setdefault(name, {})
+        self.action, self.payload, self.columns, self.filters, self.count = "select", None, None, [], None
+        self.order_by, self.offset = None, 0
+
+    def select(self, columns: str = "*", **kwargs):
+        self.action, self.columns = "select", None if columns == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def upsert(self, rows, on_conflict: str = "kb_id", **kwargs):
+        self.action, self.payload = "upsert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    insert = upsert
+
+    def delete(self, **kwargs):
+        self.action = "delete"
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column: str, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, count: int):
+        self.count = count
+        return self
+
+    def range(self, start: int, end: int):
+        self.offset, self.count = start, end - start + 1
+        return self
+
+    def execute(self):
+        time.sleep(self.owner.latency)
+        self.owner.calls[self.action] = self.owner.calls.get(self.action, 0) + 1
+        if self.action == "upsert":
+            for row in self.payload:
+                self.rows[row["kb_id"]] = {**self.rows.get(row["kb_id"], {"id": len(self.rows) + 1}), **row}
+            return SimpleNamespace(data=self.payload, count=None)
+
+        matched = [row for row in self.rows.values() if all(keep(row) for keep in self.filters)]
+        if self.action == "delete":
+            for row in matched:
+                del self.rows[row["kb_id"]]
+            return SimpleNamespace(data=matched, count=None)
+
+        if self.order_by is not None:
+            column, desc = self.order_by
+            matched = sorted(matched, key=lambda row: row.get(column), reverse=desc)
+        matched = matched[self.offset:self.offset + self.count] if self.count is not None else matched[self.offset:]
+        if self.columns is not None:
+            matched = [{column: row.get(column) for column in self.columns} for row in matched]
+        return SimpleNamespace(data=matched, count=None)
+
+
+class FakeSupabase:
+    """Supabase client serving the match_kb_articles RPC from KB_ARTICLES with canned similarities"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = {"rpc": 0}
+        self.tables: Dict[str, Dict[str, Dict]] = {}
+
+    def table(self, name: str):
+        return _FakeTable(self, name)
+
+    def rpc(self, name: str, params: Dict):
+        if name not in ("match_kb_articles", "match_kb_articles_binary"):
+            raise ValueError(f"Unknown RPC: {name}")
+        self.calls["rpc"] += 1
+        return _FakeRPC(self, params)
+
+    def match(self, query_embedding, match_threshold, match_count, filter_category=None, rescore_count=None) -> List[Dict]:
+        articles = [a for a in KB_ARTICLES if filter_category is None or a["category"] == filter_category]
+        rows = []
+        for rank, article in enumerate(articles):
+            similarity = 0.9 - 0.02 * rank
+            if similarity <= match_threshold:
+                break
+            rows.append({**article, "similarity": similarity})
+        return rows[:match_count]
+
+
+class FakeTogether:
+    """Together client answering every Llama Guard check with 'safe'"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = {"chat": 0}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.models = SimpleNamespace(list=lambda: time.sleep(self.latency) or [])
+
+    def _create(self, **kwargs):
+        self.calls["chat"] += 1
+        time.sleep(self.latency)
+        prompt = "\n".join(message["content"] for message in kwargs.get("messages", []))
+        return _completion("safe", prompt)
+
+
+class FakeCrossEncoder:
+    """CrossEncoder stand-in (predict(pairs)) scoring the word overlap of each pair"""
+
+    def predict(self, pairs):
+        scores = []
+        for query, document in pairs:
+            query_words = set(query.lower().split())
+            document_words = set(document.lower().split())
+            scores.append(len(query_words & document_words) / (len(query_words) or 1))
+        return scores
+
+
+class _FakeCollection:
+    """Collection holding the KB_ARTICLES (up to date for the sync), queries answered with canned distances"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.metadatas = {article["kb_id"]: chroma_metadata(article, EMBEDDING_MODEL) for article in KB_ARTICLES}
+        self.documents = {article["kb_id"]: article["content"] for article in KB_ARTICLES}
+        self.embeddings = {article["kb_id"]: fake_embedding(chroma_text(article)) for article in KB_ARTICLES}
+
+    def count(self) -> int:
+        return len(self.metadatas)
+
+    def get(self, ids=None, include=None):
+        ids = list(self.metadatas) if ids is None else [kb_id for kb_id in ids if kb_id in self.metadatas]
+        return {
+            "ids": ids,
+            "metadatas": [self.metadatas[kb_id] for kb_id in ids],
+            "documents": [self.documents.get(kb_id) for kb_id in ids],
+            "embeddings": [self.embeddings.get(kb_id) for kb_id in ids]
+        }
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        time.sleep(self.latency)
+        self.metadatas.update(zip(ids, metadatas or [{}] * len(ids)))
+        self.documents.update(zip(ids, documents or [None] * len(ids)))
+        self.embeddings.update(zip(ids, embeddings or [None] * len(ids)))
+
+    def delete(self, ids):
+        time.sleep(self.latency)
+        for kb_id in ids:
+            self.metadatas.pop(kb_id, None)
+            self.documents.pop(kb_id, None)
+            self.embeddings.pop(kb_id, None)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        time.sleep(self.latency)
+        category = (where or {}).get("category")
+        articles = [a for a in KB_ARTICLES if category is None or a["category"] == category][:n_results]
+        return {
+            "ids": [[a["kb_id"] for a in articles]],
+            "documents": [[a["content"] for a in articles]],
+            "metadatas": [[self.metadatas.get(a["kb_id"], chroma_metadata(a, EMBEDDING_MODEL)) for a in articles]],
+            "distances": [[0.1 + 0.05 * rank for rank in range(len(articles))]]
+        }
+
+
+class FakeChromaClient:
+    """ChromaDB client whose collection is already populated with KB_ARTICLES"""
+
+    def __init__(self, latency: float = 0.0):
+        self.collection = _FakeCollection(latency)
+
+    def get_or_create_collection(self, name: str):
+        return self.collection
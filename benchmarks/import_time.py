@@ -0,0 +1,81 @@
+"""
+Cold start report : import time of the agent module (python -X importtime, in a fresh
+interpreter) and time to construct the agent, with the heavy dependencies loaded so far.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module src.agent.async_react_agent --top 20
+"""
+from typing import Dict, List
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["openai", "supabase", "together", "chromadb", "sentence_transformers", "torch"]
+
+# Run in a fresh interpreter : construction time and heavy modules loaded
+CONSTRUCT_SCRIPT = """
+import importlib, json, sys, time
+started = time.perf_counter()
+module = importlib.import_module({module!r})
+imported = time.perf_counter()
+agent = getattr(module, {agent!r})()
+built = time.perf_counter()
+print(json.dumps({{
+    "import_s": imported - started,
+    "construct_s": built - imported,
+    "loaded": [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Rows of `python -X importtime` : self and cumulative time (microseconds), nesting level"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "level": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time / cold start report")
+    parser.add_argument("--module", default="src.agent.react_agent")
+    parser.add_argument("--agent", default=None, help="agent class constructed after the import")
+    parser.add_argument("--top", type=int, default=15, help="number of top-level imports listed")
+    args = parser.parse_args()
+
+    agent = args.agent or ("AsyncITSupportReActAgent" if "async" in args.module else "ITSupportReActAgent")
+
+    importtime = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+        capture_output=True, text=True, check=True
+    )
+    rows = parse_importtime(importtime.stderr)
+    total = next(row for row in reversed(rows) if row["module"] == args.module)
+
+    print(f"Import of {args.module}: {total['cumulative_ms']:.0f} ms")
+    print(f"\n{'module':<50} {'cumulative ms':>14}")
+    top_level = sorted((row for row in rows if row["level"] <= 1), key=lambda row: -row["cumulative_ms"])
+    for row in top_level[:args.top]:
+        print(f"{row['module']:<50} {row['cumulative_ms']:>14.1f}")
+
+    construct = subprocess.run(
+        [sys.executable, "-c", CONSTRUCT_SCRIPT.format(module=args.module, agent=agent, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True
+    )
+    report = json.loads(construct.stdout.strip().splitlines()[-1])
+    print(f"\nCold start (fresh interpreter): import {report['import_s'] * 1000:.0f} ms + "
+          f"{agent}() {report['construct_s'] * 1000:.0f} ms")
+    print(f"Heavy modules loaded: {', '.join(report['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
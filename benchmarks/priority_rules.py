@@ -0,0 +1,41 @@
+"""
+Validation of the PriorityScorer fast path : priority decided by the rules on the sample tickets,
+compared to their expected_priority (coverage, accuracy of the decided tickets, mismatches).
+
+    python -m benchmarks.priority_rules
+    python -m benchmarks.priority_rules --min-accuracy 0.85
+"""
+import argparse
+import sys
+
+from src.data.sample_tickets import SAMPLE_TICKETS
+from src.tools.priority_rules import PriorityRules, evaluate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Priority rules validation on the sample tickets")
+    parser.add_argument("--min-accuracy", type=float, default=None, help="exit with an error below this accuracy")
+    args = parser.parse_args()
+
+    rules = PriorityRules()
+    report = evaluate(SAMPLE_TICKETS, rules)
+
+    print(f"{'ticket':<10} {'expected':<10} {'rules':<10} {'score':>6}")
+    print("-" * 40)
+    for ticket in SAMPLE_TICKETS:
+        text = f"{ticket['subject']}\n{ticket['description']}"
+        score, _ = rules.score(text, ticket["expected_category"])
+        result = rules.decide(text, ticket["expected_category"])
+        print(f"{ticket['id']:<10} {ticket['expected_priority']:<10} {(result or {}).get('priority', '(LLM)'):<10} {score:>6.1f}")
+
+    print(f"\nDecided by the rules: {report['decided']}/{report['tickets']} ({report['coverage']:.0%})")
+    print(f"Accuracy of the decided tickets: {report['accuracy']:.0%}")
+    for mismatch in report["mismatches"]:
+        print(f"  {mismatch['id']}: expected {mismatch['expected']}, rules {mismatch['rules']} - {mismatch['reasoning']}")
+
+    if args.min_accuracy is not None and report["accuracy"] < args.min_accuracy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
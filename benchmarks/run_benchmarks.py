@@ -0,0 +1,295 @@
+"""
+Component microbenchmarks of the local cost of the pipeline, with the fake API clients of
+benchmarks/fake_clients.py (no network, configurable simulated latency).
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --modes static parallel --openai-latency-ms 300 --json results.json
+
+With --cassette, the analyze_ticket benchmarks go through a record/replay cassette (src/cassette.py)
+instead of the fakes : --record calls the real APIs once and stores their responses, then the
+replay runs are deterministic and free, with the recorded latencies if --replay-latency recorded.
+
+    python -m benchmarks.run_benchmarks --cassette tickets.json.gz --record --tickets 10
+    python -m benchmarks.run_benchmarks --cassette tickets.json.gz --tickets 10 --replay-latency recorded
+
+For each benchmark : ops/sec, p50 / p99 latency (ms) and peak memory allocated by one call (KiB).
+"""
+from contextlib import redirect_stdout
+from itertools import cycle
+from typing import Callable, Dict, List, Optional
+import argparse
+import io
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from src.cassette import Cassette
+from benchmarks.fake_clients import (
+    FakeChromaClient,
+    FakeCrossEncoder,
+    FakeOpenAI,
+    FakeSupabase,
+    FakeTogether,
+)
+from src.agent.react_agent import EXECUTION_MODES, ITSupportReActAgent, build_recommendation_context
+from src.data.knowledge_base import KB_ARTICLES
+from src.data.sample_tickets import SAMPLE_TICKETS
+from src.seed_knowledge_base import seed_kb, sync_kb
+from src.tools import (
+    ChromaDBVectorKBSearcher,
+    PriorityScorer,
+    SafetyChecker,
+    SupabaseVectorKBSearcher,
+    TicketCategorizer,
+)
+from src.tools.reranker import Reranker
+
+
+def bench(name: str, fn: Callable[[], object], iterations: int, warmup: int = 2) -> Dict:
+    """
+    Time `iterations` calls of fn, then measure the peak memory of one extra call with
+    tracemalloc (kept out of the timed calls, it slows the allocations down).
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - call_start) * 1000)
+    total = time.perf_counter() - started
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_sec": iterations / total if total else float("inf"),
+        "p50_ms": statistics.median(timings),
+        "p99_ms": timings[min(len(timings) - 1, int(round(0.99 * (len(timings) - 1))))],
+        "peak_kib": peak / 1024
+    }
+
+
+def fake_clients(openai_latency: float = 0.0, supabase_latency: float = 0.0, together_latency: float = 0.0) -> Dict:
+    return {
+        "openai": FakeOpenAI(latency=openai_latency),
+        "supabase": FakeSupabase(latency=supabase_latency),
+        "together": FakeTogether(latency=together_latency)
+    }
+
+
+def cassette_clients(cassette: Cassette) -> Dict:
+    """Cassette clients : wrapping the real clients to record, standalone to replay"""
+    if cassette.mode == "replay":
+        return {
+            "openai": cassette.wrap_openai(),
+            "supabase": cassette.wrap_supabase(),
+            "together": cassette.wrap_together()
+        }
+
+    from openai import OpenAI
+    from supabase import create_client
+    from together import Together
+
+    return {
+        "openai": cassette.wrap_openai(OpenAI(api_key=os.getenv("OPENAI_API_KEY"))),
+        "supabase": cassette.wrap_supabase(create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))),
+        "together": cassette.wrap_together(Together(api_key=os.getenv("TOGETHER_API_KEY")))
+    }
+
+
+def build_agent(mode: str, clients: Dict, reranker: Optional[Reranker] = None) -> ITSupportReActAgent:
+    """Agent whose tools, safety checker and LLM client all use the given clients"""
+    tools = {
+        "ticket_categorizer": TicketCategorizer(client=clients["openai"]),
+        "search_knowledge_base": SupabaseVectorKBSearcher(
+            supabase_client=clients["supabase"],
+            openai_client=clients["openai"],
+            reranker=reranker or Reranker(model=FakeCrossEncoder())
+        ),
+        "calculate_priority": PriorityScorer(client=clients["openai"])
+    }
+    return ITSupportReActAgent(
+        mode=mode,
+        speculative_search=(mode == "parallel"),
+        client=clients["openai"],
+        tools=tools,
+        safety_checker=SafetyChecker(client=clients["together"])
+    )
+
+
+def synthetic_articles(count: int) -> List[Dict]:
+    """count KB articles derived from KB_ARTICLES with distinct ids and contents"""
+    return [
+        {**article, "kb_id": f"KB-S{i:06d}", "content": f"{article['content']} (variant {i})"}
+        for i, article in enumerate(KB_ARTICLES[i % len(KB_ARTICLES)] for i in range(count))
+    ]
+
+
+def sample_observations() -> Dict:
+    """Tool observations of a typical ticket, used by the context / prompt builders"""
+    return {
+        "ticket_categorizer": {"category": "PASSWORD_ACCESS", "confidence": 92},
+        "search_knowledge_base": {
+            "articles": [
+                {**article, "similarity_score": 0.85, "rerank_score": 0.5}
+                for article in KB_ARTICLES[:3]
+            ],
+            "count": 3
+        },
+        "calculate_priority": {"priority": "HIGH", "response_time": "< 1 hour", "confidence": 85}
+    }
+
+
+def run(args) -> List[Dict]:
+    ms = 1 / 1000
+    results = []
+    ticket = SAMPLE_TICKETS[0]
+    observations = sample_observations()
+
+    # Quiet agent used by the prompt / context builders
+    with redirect_stdout(io.StringIO()):
+        agent = build_agent("react", fake_clients())
+    session = agent.create_session(ticket)
+    session.observations.update(observations)
+    session.used_tools.update(observations)
+
+    results.append(bench(
+        "_build_thought_prompt",
+        lambda: agent._build_thought_prompt(session),
+        args.iterations * 10
+    ))
+    results.append(bench(
+        "_build_recommendation_context",
+        lambda: build_recommendation_context(ticket, observations),
+        args.iterations * 10
+    ))
+
+    reranker = Reranker() if args.real_reranker else Reranker(model=FakeCrossEncoder())
+    candidates = [{**article, "similarity_score": 0.8} for article in KB_ARTICLES[:15]]
+    results.append(bench(
+        "Reranker.rerank (15 articles)" + (" [cross-encoder]" if args.real_reranker else ""),
+        lambda: reranker.rerank(f"{ticket['subject']} {ticket['description']}", [dict(c) for c in candidates]),
+        args.iterations
+    ))
+
+    chroma_searcher = ChromaDBVectorKBSearcher(
+        client=FakeOpenAI(),
+        chroma_client=FakeChromaClient(latency=args.supabase_latency_ms * ms)
+    )
+    results.append(bench(
+        "ChromaDBVectorKBSearcher.execute",
+        lambda: chroma_searcher.execute(f"{ticket['subject']}\n{ticket['description']}", category="PASSWORD_ACCESS"),
+        args.iterations
+    ))
+
+    # min_margin=0 : always decided by the centroids (embedding + similarities, no chat completion)
+    local_categorizer = TicketCategorizer(client=FakeOpenAI(latency=args.openai_latency_ms * ms), min_margin=0.0)
+    local_categorizer.warmup()
+    results.append(bench(
+        "TicketCategorizer.execute [local]",
+        lambda: local_categorizer.execute(f"{ticket['subject']}\n{ticket['description']}"),
+        args.iterations
+    ))
+
+    if args.seed_articles:
+        articles = synthetic_articles(args.seed_articles)
+        seed_openai = FakeOpenAI(latency=args.openai_latency_ms * ms)
+        seed_supabase = FakeSupabase(latency=args.supabase_latency_ms * ms)
+        with redirect_stdout(io.StringIO()):
+            results.append(bench(
+                f"seed_kb ({len(articles)} articles)",
+                lambda: seed_kb(articles, openai_client=seed_openai, supabase=seed_supabase),
+                3,
+                warmup=0
+            ))
+
+            # One article edited per run : one embeddings request and one upsert
+            edits = iter(range(1, 1000000))
+
+            def sync_one_edit():
+                articles[0] = {**articles[0], "content": f"{articles[0]['content']} (rev {next(edits)})"}
+                return sync_kb(articles, openai_client=seed_openai, supabase=seed_supabase)
+
+            results.append(bench(f"sync_kb (1 of {len(articles)} articles changed)", sync_one_edit, args.iterations))
+
+    cassette = None
+    if args.cassette:
+        cassette = Cassette(
+            args.cassette,
+            mode="record" if args.record else "replay",
+            latency=args.replay_latency,
+            latency_scale=args.latency_scale
+        )
+
+    for mode in args.modes:
+        if cassette is not None:
+            clients = cassette_clients(cassette)
+        else:
+            clients = fake_clients(
+                args.openai_latency_ms * ms,
+                args.supabase_latency_ms * ms,
+                args.together_latency_ms * ms
+            )
+        with redirect_stdout(io.StringIO()):
+            mode_agent = build_agent(mode, clients)
+        tickets = cycle(SAMPLE_TICKETS)
+        # The agent prints its progress : keep the benchmark output readable
+        with redirect_stdout(io.StringIO()):
+            results.append(bench(
+                f"analyze_ticket [{mode}]",
+                lambda: mode_agent.analyze_ticket(next(tickets)),
+                args.tickets,
+                warmup=1
+            ))
+
+    if cassette is not None and cassette.mode == "record":
+        cassette.save()
+
+    return results
+
+
+def print_results(results: List[Dict]):
+    header = f"{'benchmark':<45} {'ops/sec':>10} {'p50 ms':>10} {'p99 ms':>10} {'peak KiB':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['name']:<45} {r['ops_per_sec']:>10.1f} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} {r['peak_kib']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IT Support Advisor microbenchmarks")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per component benchmark")
+    parser.add_argument("--tickets", type=int, default=len(SAMPLE_TICKETS), help="analyze_ticket calls per mode")
+    parser.add_argument("--modes", nargs="+", default=["react", "static", "parallel", "fused"], choices=EXECUTION_MODES)
+    parser.add_argument("--openai-latency-ms", type=float, default=0.0)
+    parser.add_argument("--supabase-latency-ms", type=float, default=0.0)
+    parser.add_argument("--together-latency-ms", type=float, default=0.0)
+    parser.add_argument("--real-reranker", action="store_true", help="load the real cross-encoder model")
+    parser.add_argument("--seed-articles", type=int, default=500, help="synthetic articles of the seed_kb benchmark (0: skip)")
+    parser.add_argument("--cassette", help="record/replay cassette used instead of the fake clients")
+    parser.add_argument("--record", action="store_true", help="record the cassette with the real APIs")
+    parser.add_argument("--replay-latency", default="none", choices=["none", "recorded"])
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="factor applied to the recorded latencies")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
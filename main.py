@@ -1,3 +1,4 @@
+import sys
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -14,6 +15,18 @@ def main():
     
     print("_" * 60)
     agent_verbose = ITSupportReActAgent(verbose=False)
+    
+    # Batch sweep over all the sample tickets : python main.py --batch
+    if "--batch" in sys.argv:
+        failures = 0
+        for result in agent_verbose.analyze_batch(SAMPLE_TICKETS, max_workers=4):
+            if "error" in result:
+                failures += 1
+                print(f" {result['ticket_id']} failed: {result['error']}")
+        
+        print(f"\n Batch completed: {len(SAMPLE_TICKETS) - failures}/{len(SAMPLE_TICKETS)} tickets analyzed")
+        return
+    
     result = agent_verbose.analyze_ticket(SAMPLE_TICKETS[-1])  
     
     
@@ -0,0 +1,283 @@
+from typing import TYPE_CHECKING, Dict, List, Optional
+import asyncio
+import os
+import time
+from tenacity import retry, stop_after_attempt
+
+from src import telemetry
+from src.config import OPENAI_API_KEY, MODEL_NAME
+from src.clients import async_openai_client
+from src.rate_limiter import wait_for_retry
+from src.tools.registry import default_tools
+from src.agent.react_agent import (
+    ReActStep,
+    AnalysisSession,
+    STATIC_PLAN,
+    TOOL_DEPENDENCIES,
+    RECOMMENDATION_SYSTEM_PROMPT,
+    prepare_tool_input,
+    build_recommendation_context,
+    build_recommendation,
+    build_safety_fallback,
+)
+
+if TYPE_CHECKING:
+    from src.tools import SafetyChecker
+
+
+class AsyncITSupportReActAgent:
+    """
+    Asyncio-native agent : the tools run as a dependency DAG (TOOL_DEPENDENCIES) on the async
+    OpenAI/Together/Supabase clients, so a single process can keep many tickets in flight.
+    The per-ticket state lives in an AnalysisSession, one agent serves all concurrent tickets.
+    """
+
+    def __init__(
+        self,
+        verbose: bool = False,
+        speculative_search: bool = False,
+        max_concurrency: int = 50,
+        client=None,
+        tools: Optional[Dict] = None,
+        safety_checker: Optional["SafetyChecker"] = None
+    ):
+        """
+        Initialise the async agent (the client, tools and safety checker are created on first use)
+        Args:
+            verbose: if True, print all the steps
+            speculative_search: start an unfiltered KB search while the ticket is being categorized
+            max_concurrency: default maximum number of tickets analyzed at the same time
+            client: AsyncOpenAI compatible client of the agent (default: AsyncOpenAI with OPENAI_API_KEY)
+            tools: already built tools by name (their aexecute is used)
+            safety_checker: already built SafetyChecker (default: created when ENABLE_SAFETY_CHECK is true)
+        """
+        self._client = client
+        self._safety_checker = safety_checker
+        self.model = MODEL_NAME
+        self.verbose = verbose
+        self.speculative_search = speculative_search
+        self.max_concurrency = max_concurrency
+
+        # Initialise tools (each one is built on first use, their async clients too)
+        self.tools = tools if tools is not None else default_tools()
+
+        # Safety checks (the checker is built on first use)
+        self.enable_safety = os.getenv("ENABLE_SAFETY_CHECK", "true").lower() == "true"
+
+        # Screen the ticket itself concurrently with the analysis
+        self.screen_input = self.enable_safety and os.getenv("ENABLE_INPUT_SAFETY_CHECK", "true").lower() == "true"
+
+
+    @property
+    def client(self):
+        """AsyncOpenAI client (default: the shared one of the running event loop)"""
+        return self._client or async_openai_client(OPENAI_API_KEY)
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def safety_checker(self) -> "SafetyChecker":
+        """Llama Guard checker, created on first use"""
+        if self._safety_checker is None:
+            from src.tools import SafetyChecker
+            self._safety_checker = SafetyChecker()
+        return self._safety_checker
+
+    @safety_checker.setter
+    def safety_checker(self, safety_checker: "SafetyChecker"):
+        self._safety_checker = safety_checker
+
+
+    async def analyze_tickets(self, tickets: List[Dict], max_concurrency: Optional[int] = None) -> List[Dict]:
+        """
+        Analyze many tickets concurrently, at most max_concurrency at the same time.
+        Results are returned in the order of the tickets, a failing ticket gives an error record.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def bounded(ticket: Dict) -> Dict:
+            async with semaphore:
+                try:
+                    return await self.analyze_ticket(ticket)
+                except Exception as e:
+                    return {"ticket_id": ticket.get("id"), "error": str(e)}
+
+        return await asyncio.gather(*(bounded(ticket) for ticket in tickets))
+
+
+    async def analyze_ticket(self, ticket: Dict) -> Dict:
+        """Analyze one ticket : tool DAG, then final recommendation with safety check"""
+        session = AnalysisSession(
+            ticket=ticket,
+            ticket_text=f"{ticket['subject']}\n{ticket['description']}"
+        )
+
+        if self.verbose:
+            print(f"Start analyzing the ticket: {ticket['id']}")
+
+        # The tasks created inside copy the context, so their spans land in this trace
+        with telemetry.trace(ticket['id']) as ticket_trace:
+            if self.screen_input:
+                recommendation = await self._analyze_with_input_screening(session)
+            else:
+                recommendation = await self._analyze(session)
+
+        # Flagged ticket : the steps of the cancelled analysis are not part of the result
+        flagged_input = recommendation.get("safety_stage") == "input"
+        return {
+            "ticket_id": ticket['id'],
+            "reasoning_chain": [] if flagged_input else list(session.reasoning_chain),
+            "recommendation": recommendation,
+            "total_steps": 0 if flagged_input else session.current_step,
+            "spans": ticket_trace.to_dicts()
+        }
+
+
+    async def _analyze(self, session: AnalysisSession) -> Dict:
+        """Tool DAG, then final recommendation"""
+        await self._run_tool_graph(session)
+        return await self._generate_final_recommendation(session)
+
+
+    async def _analyze_with_input_screening(self, session: AnalysisSession) -> Dict:
+        """
+        Run the Llama Guard input check concurrently with the analysis. If the ticket is flagged,
+        the analysis task is cancelled and the safe fallback is returned right away.
+        """
+        screening = asyncio.create_task(self._screen_input(session))
+        analysis = asyncio.create_task(self._analyze(session))
+
+        try:
+            safety_result = await screening
+            if safety_result is not None and not safety_result["is_safe"]:
+                analysis.cancel()
+                if self.verbose:
+                    print(f" INPUT SAFETY VIOLATION DETECTED ({session.ticket['id']}): {safety_result['violated_categories']}")
+                return build_safety_fallback({}, safety_result['violated_categories'], stage="input")
+
+            return await analysis
+        finally:
+            # Flagged ticket, failed analysis or cancelled caller : stop both tasks and retrieve
+            # their outcome (no "Task exception was never retrieved", CancelledError included)
+            for task in (screening, analysis):
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(screening, analysis, return_exceptions=True)
+
+
+    async def _screen_input(self, session: AnalysisSession) -> Optional[Dict]:
+        """Llama Guard check of the ticket (None if the check itself failed)"""
+        try:
+            return await self.safety_checker.acheck_user_input(session.ticket_text)
+        except Exception as e:
+            if self.verbose:
+                print(f" Input safety check failed: {e}")
+            return None
+
+
+    async def _run_tool_graph(self, session: AnalysisSession):
+        """Run every tool as a task that first awaits the tasks of its dependencies"""
+        thoughts = dict(STATIC_PLAN)
+        tasks: Dict[str, asyncio.Task] = {}
+
+        # Speculative KB search : the embedding + vector query only need the ticket text
+        # (searchers without aprefetch, e.g. ChromaDB, run the plain search)
+        prefetch = None
+        if self.speculative_search and "search_knowledge_base" in self.tools:
+            search_prefetch = getattr(self.tools["search_knowledge_base"], "aprefetch", None)
+            if search_prefetch is not None:
+                prefetch = asyncio.create_task(search_prefetch(session.ticket_text))
+
+        async def run(tool_name: str):
+            for dependency in TOOL_DEPENDENCIES[tool_name]:
+                await tasks[dependency]
+
+            step_start = time.perf_counter()
+            action_input = prepare_tool_input(tool_name, session.ticket_text, session.observations)
+            extra_input = {}
+            if prefetch is not None and tool_name == "search_knowledge_base":
+                try:
+                    extra_input["candidates"] = await prefetch
+                except Exception:
+                    pass  # plain search
+
+            observation = await self._execute_tool(tool_name, {**action_input, **extra_input})
+            session.current_step += 1
+            session.used_tools.add(tool_name)
+            session.observations[tool_name] = observation
+            session.reasoning_chain.append(ReActStep(
+                step_number=session.current_step,
+                thought=thoughts.get(tool_name, f"Run {tool_name}"),
+                action=tool_name,
+                action_input=action_input,
+                observation=observation,
+                duration_ms=(time.perf_counter() - step_start) * 1000
+            ))
+
+            if self.verbose:
+                print(f" Action: {tool_name}")
+
+        # Tools whose dependencies are not all available never run (as in the sync graph)
+        runnable = {name for name in TOOL_DEPENDENCIES if name in self.tools}
+        while True:
+            blocked = {name for name in runnable if not TOOL_DEPENDENCIES[name] <= runnable}
+            if not blocked:
+                break
+            runnable -= blocked
+
+        for tool_name in TOOL_DEPENDENCIES:
+            if tool_name in runnable:
+                tasks[tool_name] = asyncio.create_task(run(tool_name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            # Cancelled analysis (flagged ticket) or search not run : do not leave the prefetch running
+            if prefetch is not None and not prefetch.done():
+                prefetch.cancel()
+
+
+    async def _execute_tool(self, tool_name: str, tool_input: Dict) -> Dict:
+        """Execute a tool asynchronously and return the observation"""
+        if tool_name not in self.tools:
+            return {"error": f"Unknown tool: {tool_name}"}
+
+        try:
+            with telemetry.span(f"tool.{tool_name}", "tool"):
+                return await self.tools[tool_name].aexecute(**tool_input)
+        except Exception as e:
+            return {"error": str(e)}
+
+
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=telemetry.before_attempt)
+    async def _generate_final_recommendation(self, session: AnalysisSession) -> Dict:
+        """Generate final recommendation with safety check"""
+        context = build_recommendation_context(session.ticket, session.observations)
+
+        with telemetry.span("llm.recommendation", "llm", model=self.model) as sp:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": RECOMMENDATION_SYSTEM_PROMPT},
+                    {"role": "user", "content": context}
+                ],
+                temperature=0.2,
+                max_tokens=600,
+                response_format={"type": "json_object"}
+            )
+            telemetry.record_usage(sp, response.usage)
+
+        recommendation_text = response.choices[0].message.content
+
+        # Safety check
+        if self.enable_safety:
+            safety_result = await self.safety_checker.acheck_agent_output(recommendation_text)
+
+            if not safety_result["is_safe"]:
+                if self.verbose:
+                    print(f" SAFETY VIOLATION DETECTED ({session.ticket['id']}): {safety_result['violated_categories']}")
+                return build_safety_fallback(session.observations, safety_result['violated_categories'])
+
+        return build_recommendation(recommendation_text, session.observations)
@@ -0,0 +1,106 @@
+from typing import Dict, Optional
+import json
+import sqlite3
+import threading
+import time
+
+
+class AnalysisResultStore:
+    """
+    Local on-disk store (SQLite) of analyze_ticket results, keyed by the ticket content hash
+    and a version stamp of the KB / model configuration.
+
+    Entries expire after ttl_seconds, and the least recently used entries are evicted when
+    the store holds more than max_entries results.
+    """
+
+    def __init__(
+        self,
+        path: str = "./analysis_cache.sqlite3",
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 10000
+    ):
+        """
+        Args:
+            path: SQLite database file
+            ttl_seconds: time to live of a result
+            max_entries: maximum number of results kept
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analysis_results_access ON analysis_results(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the stored result (None if missing or expired)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM analysis_results WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE analysis_results SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Dict):
+        """Store a JSON serializable result, then apply the TTL and size eviction"""
+        now = time.time()
+        value = json.dumps(result, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_results (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM analysis_results WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute("""
+            DELETE FROM analysis_results WHERE key IN (
+                SELECT key FROM analysis_results ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis_results")
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counts of this process and number of stored results"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM analysis_results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,61 @@
+from typing import Callable, Dict, Tuple, TypeVar
+from concurrent.futures import Future
+import hashlib
+import re
+import threading
+
+T = TypeVar("T")
+
+
+def normalize_ticket_text(ticket: Dict) -> str:
+    """Lowercase subject + description, without punctuation and repeated whitespace"""
+    text = f"{ticket.get('subject', '')}\n{ticket.get('description', '')}".lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def ticket_content_hash(ticket: Dict) -> str:
+    """Hash of the normalized ticket content (the id, user and timestamp are ignored)"""
+    return hashlib.sha256(normalize_ticket_text(ticket).encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key : the first caller (leader) runs the
+    computation, the callers arriving while it is in flight wait for its result instead
+    of starting their own. Nothing is kept once the computation is finished.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Run fn once for all the concurrent callers of key.
+        Returns (result, shared) : shared is True for the callers that waited on the leader.
+        An exception of the leader is raised in every caller.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
@@ -0,0 +1,78 @@
+from typing import List, Optional
+import json
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a streamed JSON object : feed() the completion chunks as they
+    arrive, it returns the string items of one top-level array field (e.g. "immediate_actions")
+    as soon as each item is complete, without waiting for the end of the document.
+    """
+
+    def __init__(self, field_name: str = "immediate_actions"):
+        self.field_name = field_name
+        self.stack: List[str] = []         # open containers : "{" or "["
+        self.in_string = False
+        self.escape = False
+        self.raw = []                      # characters of the current string (escapes kept)
+        self.expect_key = False
+        self.current_key: Optional[str] = None
+        self.in_field = False              # inside the array of field_name
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume a chunk of text and return the array items completed in it"""
+        items = []
+
+        for char in chunk:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                    self.raw.append(char)
+                elif char == "\\":
+                    self.escape = True
+                    self.raw.append(char)
+                elif char == '"':
+                    self.in_string = False
+                    item = self._end_string()
+                    if item is not None:
+                        items.append(item)
+                else:
+                    self.raw.append(char)
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.raw = []
+            elif char == "{":
+                self.stack.append("{")
+                self.expect_key = True
+            elif char == "[":
+                # The tracked field is an array value of the top-level object
+                if self.stack == ["{"] and self.current_key == self.field_name:
+                    self.in_field = True
+                self.stack.append("[")
+            elif char in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if char == "]" and self.in_field and self.stack == ["{"]:
+                    self.in_field = False
+                self.expect_key = False
+            elif char == ",":
+                self.expect_key = bool(self.stack) and self.stack[-1] == "{"
+
+        return items
+
+    def _end_string(self) -> Optional[str]:
+        """Handle a completed string : object key, tracked array item or other value"""
+        text = json.loads('"' + "".join(self.raw) + '"')
+
+        if self.stack and self.stack[-1] == "{" and self.expect_key:
+            self.expect_key = False
+            if len(self.stack) == 1:
+                self.current_key = text
+            return None
+
+        if self.in_field and self.stack == ["{", "["]:
+            return text
+
+        return None
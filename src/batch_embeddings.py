@@ -0,0 +1,130 @@
+from typing import Callable, Dict, List, Optional, Sequence, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+
+from tenacity import retry, stop_after_attempt
+
+from src.config import EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_TOKENS, EMBEDDING_CONCURRENCY, EMBEDDING_DIMENSIONS
+from src.rate_limiter import wait_for_retry
+from src.telemetry import span, record_usage, before_attempt, submit
+
+MAX_INPUT_TOKENS = 8191  # per text, for the text-embedding-3 models
+
+
+def embedding_request(model: str, texts: Union[str, List[str]], dimensions: Optional[int] = EMBEDDING_DIMENSIONS) -> Dict:
+    """embeddings.create arguments, with the shortened size when dimensions is set"""
+    request = {"model": model, "input": texts}
+    if dimensions:
+        request["dimensions"] = dimensions
+    return request
+
+
+def estimate_text_tokens(text: str) -> int:
+    """~4 characters per token"""
+    return len(text) // 4 + 1
+
+
+def plan_batches(
+    texts: Sequence[str],
+    max_inputs: int = EMBEDDING_BATCH_SIZE,
+    max_tokens: int = EMBEDDING_BATCH_TOKENS
+) -> List[List[int]]:
+    """Indices of texts grouped in requests of at most max_inputs texts and max_tokens (estimated)"""
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = estimate_text_tokens(text)
+        if tokens > MAX_INPUT_TOKENS:
+            raise ValueError(f"Text {i} is too long to embed (~{tokens} tokens)")
+        if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class Progress:
+    """Thread-safe progress / throughput report (printed every `every` seconds and at the end)"""
+
+    def __init__(self, label: str, total: int, every: float = 2.0):
+        self.label = label
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.started = time.perf_counter()
+        self._printed = self.started
+        self._lock = threading.Lock()
+
+    def update(self, count: int):
+        with self._lock:
+            self.done += count
+            now = time.perf_counter()
+            if now - self._printed >= self.every or self.done >= self.total:
+                self._printed = now
+                print(f"   {self.label}: {self.done}/{self.total} ({self.rate():.1f}/s)")
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> Dict:
+        return {"count": self.done, "seconds": time.perf_counter() - self.started, "per_second": self.rate()}
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
+def _embed_batch(client, model: str, texts: List[str], dimensions: Optional[int]) -> List[List[float]]:
+    with span("embedding.batch", "embedding", model=model, count=len(texts)) as sp:
+        response = client.embeddings.create(**embedding_request(model, texts, dimensions))
+        record_usage(sp, getattr(response, "usage", None))
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def embed_batches(
+    client,
+    model: str,
+    texts: Sequence[str],
+    on_batch: Optional[Callable[[List[int], List[List[float]]], None]] = None,
+    max_inputs: int = EMBEDDING_BATCH_SIZE,
+    max_tokens: int = EMBEDDING_BATCH_TOKENS,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    dimensions: Optional[int] = EMBEDDING_DIMENSIONS
+) -> List[List[float]]:
+    """
+    Embed many texts with batched requests, at most `concurrency` in flight
+
+    Args:
+        client: OpenAI compatible client (the shared one goes through the rate limiter and the cache)
+        model: embedding model
+        texts: texts to embed
+        on_batch: called with (indices, embeddings) as each batch completes (e.g. to write it)
+        max_inputs / max_tokens: limits of one request
+        concurrency: requests in flight
+        dimensions: shortened embeddings (text-embedding-3 models, default: EMBEDDING_DIMENSIONS)
+
+    Returns:
+        The embedding of each text, in order
+    """
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+
+    def run(indices: List[int]):
+        batch = _embed_batch(client, model, [texts[i] for i in indices], dimensions)
+        for i, embedding in zip(indices, batch):
+            embeddings[i] = embedding
+        if on_batch is not None:
+            on_batch(indices, batch)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        # The batch spans go to the trace of the caller
+        futures = [submit(executor, run, indices) for indices in plan_batches(texts, max_inputs, max_tokens)]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except Exception:
+            # Do not send the batches still queued
+            for future in futures:
+                future.cancel()
+            raise
+    return embeddings
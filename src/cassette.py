@@ -0,0 +1,267 @@
+from typing import Dict, List, Optional
+from types import SimpleNamespace
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request was not recorded in the cassette"""
+
+
+def _to_plain(obj):
+    """JSON friendly copy of an SDK response (pydantic models, namespaces, lists, dicts)"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, dict):
+        return {key: _to_plain(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_plain(value) for value in obj]
+    if hasattr(obj, "__dict__"):
+        return {key: _to_plain(value) for key, value in vars(obj).items() if not key.startswith("_")}
+    return obj
+
+
+def _to_namespace(value):
+    """Attribute access on a replayed response (response.choices[0].message.content)"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+def request_key(kind: str, request: Dict) -> str:
+    """Hash of the request kind and arguments"""
+    payload = json.dumps({"kind": kind, "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Record / replay of the external API calls (OpenAI chat and embeddings, Supabase RPC,
+    Together chat) in a gzip JSON file, keyed by a hash of each request.
+
+    In "record" mode the wrapped clients call the real APIs and store the responses with their
+    latency. In "replay" mode they serve the stored responses without any network, optionally
+    sleeping the recorded latency times latency_scale. Identical requests are replayed in the
+    order they were recorded (the last response is reused once they run out).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        latency: str = "none",
+        latency_scale: float = 1.0
+    ):
+        """
+        Args:
+            path: cassette file (.json.gz)
+            mode: "record" or "replay"
+            latency: "none" (replay instantly) or "recorded" (sleep the recorded latency)
+            latency_scale: factor applied to the recorded latencies
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if latency not in ("none", "recorded"):
+            raise ValueError(f"Unknown replay latency: {latency}")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.interactions: Dict[str, List[Dict]] = {}
+        self._replayed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if mode == "replay" or os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            self.interactions = json.load(f)["interactions"]
+
+    def save(self):
+        with self._lock:
+            payload = {"version": 1, "interactions": self.interactions}
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode == "record":
+            self.save()
+
+    # ==================== Record / replay ====================
+
+    def call(self, kind: str, request: Dict, fn, rebuild=_to_namespace):
+        """
+        Response of fn() in record mode, the stored response of the same request in replay mode
+        (turned back into a response object by rebuild)
+        """
+        key = request_key(kind, request)
+
+        if self.mode == "replay":
+            entry = self._next_entry(kind, key)
+            self._sleep(entry["latency"])
+            return rebuild(entry["response"])
+
+        started = time.perf_counter()
+        response = fn()
+        self._record(key, {
+            "kind": kind,
+            "latency": time.perf_counter() - started,
+            "response": _to_plain(response)
+        })
+        return response
+
+    def stream(self, kind: str, request: Dict, fn):
+        """Same as call for a streamed completion : the chunks are stored with their arrival times"""
+        key = request_key(kind, request)
+
+        if self.mode == "replay":
+            entry = self._next_entry(kind, key)
+            return self._replay_stream(entry)
+
+        return self._record_stream(key, kind, fn)
+
+    def _record_stream(self, key: str, kind: str, fn):
+        started = time.perf_counter()
+        chunks, offsets = [], []
+        for chunk in fn():
+            offsets.append(time.perf_counter() - started)
+            chunks.append(_to_plain(chunk))
+            yield chunk
+        self._record(key, {"kind": kind, "latency": offsets[-1] if offsets else 0.0, "chunks": chunks, "offsets": offsets})
+
+    def _replay_stream(self, entry: Dict):
+        previous = 0.0
+        for chunk, offset in zip(entry["chunks"], entry["offsets"]):
+            self._sleep(offset - previous)
+            previous = offset
+            yield _to_namespace(chunk)
+
+    def _record(self, key: str, entry: Dict):
+        with self._lock:
+            self.interactions.setdefault(key, []).append(entry)
+
+    def _next_entry(self, kind: str, key: str) -> Dict:
+        with self._lock:
+            entries = self.interactions.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded {kind} response for request {key[:12]}")
+            index = self._replayed.get(key, 0)
+            self._replayed[key] = index + 1
+            return entries[min(index, len(entries) - 1)]
+
+    def _sleep(self, seconds: float):
+        if self.latency == "recorded" and seconds > 0:
+            time.sleep(seconds * self.latency_scale)
+
+    # ==================== Client wrappers ====================
+
+    def wrap_openai(self, client=None) -> "CassetteChatClient":
+        """OpenAI client (chat completions + embeddings). client can be None in replay mode"""
+        return CassetteChatClient(self, client, "openai")
+
+    def wrap_together(self, client=None) -> "CassetteChatClient":
+        """Together client (chat completions). client can be None in replay mode"""
+        return CassetteChatClient(self, client, "together")
+
+    def wrap_supabase(self, client=None) -> "CassetteSupabaseClient":
+        """Supabase client (rpc). client can be None in replay mode"""
+        return CassetteSupabaseClient(self, client)
+
+
+class _CassetteCompletions:
+
+    def __init__(self, owner: "CassetteChatClient"):
+        self.owner = owner
+
+    def create(self, **kwargs):
+        kind = f"{self.owner.provider}.chat"
+        cassette, client = self.owner.cassette, self.owner.client
+        if kwargs.get("stream"):
+            return cassette.stream(kind, kwargs, lambda: client.chat.completions.create(**kwargs))
+        return cassette.call(kind, kwargs, lambda: client.chat.completions.create(**kwargs))
+
+
+class _CassetteEmbeddings:
+
+    def __init__(self, owner: "CassetteChatClient"):
+        self.owner = owner
+
+    def create(self, **kwargs):
+        client = self.owner.client
+        return self.owner.cassette.call(f"{self.owner.provider}.embeddings", kwargs, lambda: client.embeddings.create(**kwargs))
+
+
+class CassetteChatClient:
+    """
+    OpenAI / Together compatible client going through a cassette. The other attributes are the
+    wrapped client's, models.list (connection warmup) is a no-op in replay mode.
+    """
+
+    def __init__(self, cassette: Cassette, client, provider: str):
+        self.cassette = cassette
+        self.client = client
+        self.provider = provider
+        self.chat = SimpleNamespace(completions=_CassetteCompletions(self))
+        self.embeddings = _CassetteEmbeddings(self)
+        self.models = SimpleNamespace(list=self._list_models)
+
+    def _list_models(self):
+        if self.cassette.mode == "replay":
+            return SimpleNamespace(data=[])
+        return self.client.models.list()
+
+    def __getattr__(self, name: str):
+        return _wrapped_attribute(self, name)
+
+
+class _CassetteRPC:
+
+    def __init__(self, owner: "CassetteSupabaseClient", name: str, params: Optional[Dict]):
+        self.owner = owner
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        client = self.owner.client
+        request = {"name": self.name, "params": self.params}
+        # The rows stay plain dicts, like in the postgrest response
+        return self.owner.cassette.call(
+            "supabase.rpc",
+            request,
+            lambda: client.rpc(self.name, self.params).execute(),
+            rebuild=lambda response: SimpleNamespace(**response)
+        )
+
+
+class CassetteSupabaseClient:
+    """Supabase compatible client (rpc(...).execute()) going through a cassette, the other attributes are the wrapped client's"""
+
+    def __init__(self, cassette: Cassette, client):
+        self.cassette = cassette
+        self.client = client
+
+    def rpc(self, name: str, params: Optional[Dict] = None):
+        return _CassetteRPC(self, name, params)
+
+    def __getattr__(self, name: str):
+        return _wrapped_attribute(self, name)
+
+
+def _wrapped_attribute(wrapper, name: str):
+    """Attribute of the client wrapped by a cassette client (not recorded)"""
+    if name == "client":
+        raise AttributeError(name)
+    if wrapper.client is None:
+        raise AttributeError(f"{type(wrapper).__name__}.{name} needs the real client (replay mode only serves the recorded calls)")
+    return getattr(wrapper.client, name)
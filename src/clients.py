@@ -0,0 +1,256 @@
+from typing import Dict, Optional, Tuple
+import asyncio
+import importlib
+import importlib.util
+import os
+import threading
+import weakref
+
+from src.config import (
+    OPENAI_API_KEY,
+    ENABLE_EMBEDDING_CACHE,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP2_ENABLED,
+)
+from src.rate_limiter import rate_limited
+
+
+def http2_available() -> bool:
+    """HTTP/2 is used when enabled and the h2 package is installed (HTTP/1.1 keep-alive otherwise)"""
+    return HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+class ClientRegistry:
+    """
+    Process-wide OpenAI / Together / Supabase clients, created on first use and shared by all the
+    tools, agents and tickets so they reuse the same keep-alive (HTTP/2 when available) connection
+    pools and TLS sessions instead of one pool per client.
+
+    The OpenAI and Together clients are wrapped in the shared rate limiter, without the SDK retries
+    (max_retries=0) so every attempt goes through the limiter. Async clients are kept
+    per event loop, their connections cannot be reused from another loop.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        timeout: float = HTTP_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        http2: Optional[bool] = None
+    ):
+        """
+        Args:
+            max_connections: connections open at once per pool
+            max_keepalive_connections: idle connections kept open per pool
+            keepalive_expiry: seconds an idle connection is kept
+            timeout / connect_timeout: request and connection timeouts (seconds)
+            http2: use HTTP/2 (default: HTTP2_ENABLED and h2 installed)
+        """
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.http2 = http2_available() if http2 is None else http2
+
+        self._clients: Dict[Tuple[str, Optional[str]], object] = {}
+        self._http_clients = []
+        self._async_http_clients = []
+        self._lock = threading.Lock()
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> {key: client}
+        self._async_locks = weakref.WeakKeyDictionary()  # event loop -> asyncio.Lock
+
+    # ==================== HTTP pools ====================
+
+    def _http_options(self, httpx) -> Dict:
+        return {
+            "http2": self.http2,
+            "timeout": httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+        }
+
+    def _sdk_http_client(self, sdk, is_async: bool):
+        """Pooled http client of an OpenAI-style SDK (its own default client, with our pool options)"""
+        factory = sdk.DefaultAsyncHttpxClient if is_async else sdk.DefaultHttpxClient
+        # The SDK may ship its own httpx distribution : build the options with the one it subclasses
+        httpx = importlib.import_module(factory.__mro__[1].__module__.split(".")[0])
+        http_client = factory(**self._http_options(httpx))
+        (self._async_http_clients if is_async else self._http_clients).append(http_client)
+        return http_client
+
+    def _httpx_client(self, is_async: bool):
+        import httpx
+        factory = httpx.AsyncClient if is_async else httpx.Client
+        http_client = factory(follow_redirects=True, **self._http_options(httpx))
+        (self._async_http_clients if is_async else self._http_clients).append(http_client)
+        return http_client
+
+    def _get(self, key: Tuple[str, Optional[str]], build):
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = build()
+                    self._clients[key] = client
+        return client
+
+    def _get_async(self, key: Tuple[str, Optional[str]], build):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                client = build()
+                clients[key] = client
+        return client
+
+    @staticmethod
+    def _with_embedding_cache(client, is_async: bool):
+        """Serve the embeddings already computed from the shared embedding cache"""
+        if not ENABLE_EMBEDDING_CACHE:
+            return client
+        from src.embedding_cache import cached_embeddings
+        return cached_embeddings(client, is_async=is_async)
+
+    # ==================== Clients ====================
+
+    def openai(self, api_key: Optional[str] = None):
+        """Shared OpenAI client (rate limited, embeddings cached)"""
+        api_key = api_key or OPENAI_API_KEY
+
+        def build():
+            import openai
+            client = rate_limited(openai.OpenAI(api_key=api_key, max_retries=0, http_client=self._sdk_http_client(openai, False)), "openai")
+            return self._with_embedding_cache(client, is_async=False)
+
+        return self._get(("openai", api_key), build)
+
+    def async_openai(self, api_key: Optional[str] = None):
+        """Shared AsyncOpenAI client of the running event loop (rate limited, embeddings cached)"""
+        api_key = api_key or OPENAI_API_KEY
+
+        def build():
+            import openai
+            client = openai.AsyncOpenAI(api_key=api_key, max_retries=0, http_client=self._sdk_http_client(openai, True))
+            return self._with_embedding_cache(rate_limited(client, "openai", is_async=True), is_async=True)
+
+        return self._get_async(("openai", api_key), build)
+
+    def together(self, api_key: Optional[str] = None):
+        """Shared Together client (rate limited)"""
+        api_key = api_key or os.getenv("TOGETHER_API_KEY")
+
+        def build():
+            import together
+            client = together.Together(api_key=api_key, max_retries=0, http_client=self._sdk_http_client(together, False))
+            return rate_limited(client, "together")
+
+        return self._get(("together", api_key), build)
+
+    def async_together(self, api_key: Optional[str] = None):
+        """Shared AsyncTogether client of the running event loop (rate limited)"""
+        api_key = api_key or os.getenv("TOGETHER_API_KEY")
+
+        def build():
+            import together
+            client = together.AsyncTogether(api_key=api_key, max_retries=0, http_client=self._sdk_http_client(together, True))
+            return rate_limited(client, "together", is_async=True)
+
+        return self._get_async(("together", api_key), build)
+
+    def supabase(self, url: Optional[str] = None, key: Optional[str] = None):
+        """Shared Supabase client"""
+        url = url or os.getenv("SUPABASE_URL")
+        key = key or os.getenv("SUPABASE_KEY")
+
+        def build():
+            from supabase import create_client, ClientOptions
+            options = ClientOptions(httpx_client=self._httpx_client(False), postgrest_client_timeout=self.timeout)
+            return create_client(url, key, options=options)
+
+        return self._get(("supabase", f"{url}|{key}"), build)
+
+    async def async_supabase(self, url: Optional[str] = None, key: Optional[str] = None):
+        """Shared async Supabase client of the running event loop"""
+        url = url or os.getenv("SUPABASE_URL")
+        key = key or os.getenv("SUPABASE_KEY")
+        cache_key = ("supabase", f"{url}|{key}")
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            lock = self._async_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            client = self._async_clients.get(loop, {}).get(cache_key)
+            if client is None:
+                from supabase import acreate_client, AsyncClientOptions
+                options = AsyncClientOptions(httpx_client=self._httpx_client(True), postgrest_client_timeout=self.timeout)
+                client = await acreate_client(url, key, options=options)
+                with self._lock:
+                    self._async_clients.setdefault(loop, {})[cache_key] = client
+        return client
+
+    def close(self):
+        """Close the sync connection pools (the clients are created again on next use)"""
+        with self._lock:
+            http_clients, self._http_clients = self._http_clients, []
+            self._clients.clear()
+        for http_client in http_clients:
+            http_client.close()
+
+    async def aclose(self):
+        """Close every connection pool, sync and async"""
+        self.close()
+        with self._lock:
+            http_clients, self._async_http_clients = self._async_http_clients, []
+            self._async_clients.clear()
+        for http_client in http_clients:
+            await http_client.aclose()
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """The client registry shared by the whole process"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry()
+    return _registry
+
+
+def openai_client(api_key: Optional[str] = None):
+    return get_client_registry().openai(api_key)
+
+
+def async_openai_client(api_key: Optional[str] = None):
+    return get_client_registry().async_openai(api_key)
+
+
+def together_client(api_key: Optional[str] = None):
+    return get_client_registry().together(api_key)
+
+
+def async_together_client(api_key: Optional[str] = None):
+    return get_client_registry().async_together(api_key)
+
+
+def supabase_client(url: Optional[str] = None, key: Optional[str] = None):
+    return get_client_registry().supabase(url, key)
+
+
+async def async_supabase_client(url: Optional[str] = None, key: Optional[str] = None):
+    return await get_client_registry().async_supabase(url, key)
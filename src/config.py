@@ -14,5 +14,46 @@ TEMPERATURE = 0.1  # Low pour plus de cohérence
 MAX_TOKENS = 500
 
 # Embedding Config
-EMBEDDING_DIMENSION = 1536  # text-embedding-3-small dimension
-SIMILARITY_THRESHOLD = 0.7
\ No newline at end of file
+# Shortened embeddings : `dimensions` of the text-embedding-3 models (unset: the native size)
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+EMBEDDING_DIMENSION = EMBEDDING_DIMENSIONS or 1536  # text-embedding-3-small dimension
+SIMILARITY_THRESHOLD = 0.7
+
+# Compact vector codes scanned by the in-memory index (see src/vector_index.py) / the Supabase search,
+# the top RESCORE_CANDIDATES are rescored with the full-precision vectors
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none")  # none, int8 or binary
+RESCORE_CANDIDATES = int(os.getenv("RESCORE_CANDIDATES", "50"))
+
+# Embedding cache (shared on-disk cache of the embeddings, see src/embedding_cache.py)
+ENABLE_EMBEDDING_CACHE = os.getenv("ENABLE_EMBEDDING_CACHE", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")  # or float16
+
+# Batched embeddings (KB seeding / population)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))  # texts per request (API max 2048)
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))  # estimated tokens per request (API max 300k)
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))  # requests in flight
+UPSERT_CHUNK_SIZE = int(os.getenv("UPSERT_CHUNK_SIZE", "200"))  # rows per bulk upsert
+
+# Local categorizer : embedding centroids decide, the LLM is only called below this margin
+ENABLE_LOCAL_CATEGORIZER = os.getenv("ENABLE_LOCAL_CATEGORIZER", "true").lower() == "true"
+LOCAL_CATEGORIZER_MIN_MARGIN = float(os.getenv("LOCAL_CATEGORIZER_MIN_MARGIN", "0.05"))  # cosine similarity gap
+
+# Priority rules : clear tickets get their priority from the rules, the ambiguous ones from the LLM
+ENABLE_PRIORITY_RULES = os.getenv("ENABLE_PRIORITY_RULES", "true").lower() == "true"
+
+# Rate limits (per provider and model, the real quota of the account)
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+TOGETHER_RPM_LIMIT = int(os.getenv("TOGETHER_RPM_LIMIT", "600"))
+TOGETHER_TPM_LIMIT = int(os.getenv("TOGETHER_TPM_LIMIT", "180000"))
+RATE_LIMIT_HEADROOM = float(os.getenv("RATE_LIMIT_HEADROOM", "0.9"))  # stay just under the quota
+
+# HTTP connection pools (shared by all the OpenAI / Together / Supabase clients, see src/clients.py)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # seconds an idle connection is kept
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"  # needs the h2 package
@@ -0,0 +1,260 @@
+from typing import Dict, List, Optional, Sequence
+from types import SimpleNamespace
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from src.config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB, EMBEDDING_CACHE_DTYPE
+
+DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def embedding_key(model: str, dimensions: Optional[int], text: str) -> str:
+    """Content address of an embedding : hash of the model, the dimensions and the text"""
+    return hashlib.sha256(f"{model}\0{dimensions or ''}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache (SQLite) shared by every process of the machine, keyed by
+    (model, dimensions, hash of the text). The vectors are stored as float32 or float16 blobs
+    and the least recently used ones are evicted above max_mb.
+
+    Several processes can read and write the same file : WAL journal, and a busy timeout so a
+    writer waits for the others instead of failing.
+    """
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_mb: float = EMBEDDING_CACHE_MAX_MB,
+        dtype: str = EMBEDDING_CACHE_DTYPE
+    ):
+        """
+        Args:
+            path: SQLite database file
+            max_mb: size cap of the stored vectors (MB)
+            dtype: "float32" or "float16" (half the size, ~3 significant digits)
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding cache dtype: {dtype}")
+
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dtype TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: Sequence[str], dimensions: Optional[int] = None) -> List[Optional[List[float]]]:
+        """Cached embedding of each text (None for the misses)"""
+        keys = [embedding_key(model, dimensions, text) for text in texts]
+        now = time.time()
+        with self._lock:
+            rows = {}
+            unique = list(set(keys))
+            # SQLite limits the number of parameters of a query
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.update({
+                    key: (dtype, vector) for key, dtype, vector in self._conn.execute(
+                        f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                    )
+                })
+                self._conn.execute(f"UPDATE embeddings SET last_access = ? WHERE key IN ({placeholders})", (now, *chunk))
+            self._conn.commit()
+
+        results = []
+        for key in keys:
+            row = rows.get(key)
+            if row is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append(np.frombuffer(row[1], dtype=DTYPES[row[0]]).astype(np.float32).tolist())
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]], dimensions: Optional[int] = None):
+        """Store the embeddings of texts, then apply the size eviction"""
+        now = time.time()
+        rows = []
+        for text, embedding in zip(texts, embeddings):
+            blob = np.asarray(embedding, dtype=DTYPES[self.dtype]).tobytes()
+            rows.append((embedding_key(model, dimensions, text), model, self.dtype, blob, len(blob), now))
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dtype, vector, size, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Keep the most recently used vectors that fit in max_bytes
+        self._conn.execute("""
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY last_access DESC, key) AS kept FROM embeddings
+                ) WHERE kept > ?
+            )
+        """, (self.max_bytes,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counts of this process, number and size of the stored vectors"""
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_mb": size / (1024 * 1024)
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """The embedding cache shared by the clients of the process"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+# ==================== Client wrapper ====================
+
+class _CachedEmbeddings:
+
+    def __init__(self, owner: "CachedEmbeddingsClient"):
+        self.owner = owner
+
+    def _split(self, kwargs: Dict):
+        """Texts of a cacheable request (None for token arrays or a non float encoding)"""
+        texts = kwargs.get("input")
+        if isinstance(texts, str):
+            texts = [texts]
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            return None
+        if kwargs.get("encoding_format") not in (None, "float"):
+            return None
+        return texts
+
+    def _response(self, model: str, embeddings: List[List[float]], usage, hits: int):
+        """Embeddings response with the SDK shape (usage of the texts actually sent)"""
+        return SimpleNamespace(
+            object="list",
+            model=model,
+            data=[SimpleNamespace(object="embedding", index=i, embedding=embedding) for i, embedding in enumerate(embeddings)],
+            usage=usage or SimpleNamespace(prompt_tokens=0, total_tokens=0),
+            cache_hits=hits
+        )
+
+    def _lookup(self, kwargs: Dict):
+        """Cached embeddings of the request texts and the distinct texts still to fetch"""
+        texts = self._split(kwargs)
+        if texts is None:
+            return None
+        embeddings = self.owner.cache.get_many(kwargs["model"], texts, kwargs.get("dimensions"))
+        missing = sorted({text for text, embedding in zip(texts, embeddings) if embedding is None})
+        return texts, embeddings, missing
+
+    def _complete(self, kwargs: Dict, texts: List[str], embeddings: List, missing: List[str], response):
+        """Store the fetched embeddings and build the response of the whole request"""
+        usage = None
+        if missing:
+            fetched = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            self.owner.cache.put_many(kwargs["model"], missing, fetched, kwargs.get("dimensions"))
+            by_text = dict(zip(missing, fetched))
+            embeddings = [by_text[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+            usage = response.usage
+        fetched_texts = set(missing)
+        hits = sum(text not in fetched_texts for text in texts)
+        return self._response(kwargs["model"], embeddings, usage, hits)
+
+    def create(self, **kwargs):
+        create = self.owner.client.embeddings.create
+        lookup = self._lookup(kwargs)
+        if lookup is None:
+            return create(**kwargs)
+        texts, embeddings, missing = lookup
+        response = create(**{**kwargs, "input": missing}) if missing else None
+        return self._complete(kwargs, texts, embeddings, missing, response)
+
+    async def acreate(self, **kwargs):
+        create = self.owner.client.embeddings.create
+        lookup = self._lookup(kwargs)
+        if lookup is None:
+            return await create(**kwargs)
+        texts, embeddings, missing = lookup
+        response = await create(**{**kwargs, "input": missing}) if missing else None
+        return self._complete(kwargs, texts, embeddings, missing, response)
+
+
+class CachedEmbeddingsClient:
+    """
+    OpenAI compatible client (sync or async) whose embeddings are served from the embedding
+    cache when already computed. Only the missing texts are sent, in one request. Every other
+    attribute is the wrapped client's.
+    """
+
+    def __init__(self, client, is_async: bool = False, cache: Optional[EmbeddingCache] = None):
+        """
+        Args:
+            client: OpenAI compatible client (AsyncOpenAI compatible with is_async)
+            is_async: the wrapped client is an async client
+            cache: cache to use (default: the shared one)
+        """
+        self.client = client
+        self.is_async = is_async
+        self.cache = cache or get_embedding_cache()
+        cached = _CachedEmbeddings(self)
+        self.embeddings = SimpleNamespace(create=cached.acreate if is_async else cached.create)
+
+    def __getattr__(self, name: str):
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+
+def cached_embeddings(client, is_async: bool = False) -> CachedEmbeddingsClient:
+    """Wrap an OpenAI client so its embeddings go through the shared embedding cache"""
+    return CachedEmbeddingsClient(client, is_async=is_async)
@@ -0,0 +1,299 @@
+from typing import Dict, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from types import SimpleNamespace
+import asyncio
+import threading
+import time
+
+from tenacity import wait_exponential
+
+from src import telemetry
+from src.config import (
+    OPENAI_RPM_LIMIT,
+    OPENAI_TPM_LIMIT,
+    TOGETHER_RPM_LIMIT,
+    TOGETHER_TPM_LIMIT,
+    RATE_LIMIT_HEADROOM,
+)
+
+# Default quota of each provider (requests and tokens per minute), applied per model
+PROVIDER_LIMITS = {
+    "openai": (OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT),
+    "together": (TOGETHER_RPM_LIMIT, TOGETHER_TPM_LIMIT),
+}
+
+DEFAULT_COMPLETION_TOKENS = 256  # estimate when the request has no max_tokens
+
+
+class TokenBucket:
+    """Bucket of `capacity` units refilled continuously over one minute"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds before `amount` units are available (after refill)"""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+
+class RateLimiter:
+    """
+    Process-wide limiter of the LLM calls : one requests-per-minute and one tokens-per-minute
+    bucket per (provider, model), sized at RATE_LIMIT_HEADROOM of the quota so the calls of all
+    the tools and tickets stay just under it. A 429 Retry-After pauses the (provider, model)
+    until the given time. The token cost is estimated before the call, then settled with the
+    real usage of the response.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, int]]] = None, headroom: float = RATE_LIMIT_HEADROOM):
+        self.limits = dict(limits or PROVIDER_LIMITS)
+        self.headroom = headroom
+        self._overrides: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        self._buckets: Dict[Tuple[str, str], Tuple[TokenBucket, TokenBucket]] = {}
+        self._paused_until: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, provider: str, model: str, rpm: int, tpm: int):
+        """Quota of one model (other models use the provider default)"""
+        with self._lock:
+            self._overrides[(provider, model)] = (rpm, tpm)
+            self._buckets.pop((provider, model), None)
+
+    def _get_buckets(self, key: Tuple[str, str]) -> Tuple[TokenBucket, TokenBucket]:
+        buckets = self._buckets.get(key)
+        if buckets is None:
+            rpm, tpm = self._overrides.get(key) or self.limits[key[0]]
+            buckets = (TokenBucket(rpm * self.headroom), TokenBucket(tpm * self.headroom))
+            self._buckets[key] = buckets
+        return buckets
+
+    def _reserve(self, key: Tuple[str, str], tokens: float) -> float:
+        """Take one request and `tokens` if available (returns 0), else the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            requests, token_bucket = self._get_buckets(key)
+            requests.refill(now)
+            token_bucket.refill(now)
+
+            wait = max(
+                self._paused_until.get(key, 0.0) - now,
+                requests.wait_time(1),
+                token_bucket.wait_time(tokens)
+            )
+            if wait <= 0:
+                requests.level -= 1
+                token_bucket.level -= tokens
+            return wait
+
+    def acquire(self, provider: str, model: str, tokens: float) -> float:
+        """Block until the call can be sent, returns the seconds waited"""
+        key = (provider, model)
+        started = time.monotonic()
+        wait = self._reserve(key, tokens)
+        if wait <= 0:
+            return 0.0
+
+        with telemetry.span("rate_limit_wait", "rate_limit", provider=provider, model=model):
+            while wait > 0:
+                time.sleep(wait)
+                wait = self._reserve(key, tokens)
+        return time.monotonic() - started
+
+    async def aacquire(self, provider: str, model: str, tokens: float) -> float:
+        """Async version of acquire"""
+        key = (provider, model)
+        started = time.monotonic()
+        wait = self._reserve(key, tokens)
+        if wait <= 0:
+            return 0.0
+
+        with telemetry.span("rate_limit_wait", "rate_limit", provider=provider, model=model):
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._reserve(key, tokens)
+        return time.monotonic() - started
+
+    def settle(self, provider: str, model: str, estimated: float, usage):
+        """Give back (or take) the difference between the estimated and the real token usage"""
+        if usage is None:
+            return
+        actual = getattr(usage, "total_tokens", None)
+        if actual is None:
+            actual = (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+        with self._lock:
+            _, token_bucket = self._get_buckets((provider, model))
+            token_bucket.level = min(token_bucket.capacity, token_bucket.level + estimated - actual)
+
+    def pause(self, provider: str, model: str, seconds: float):
+        """Hold every call to (provider, model) for `seconds` (Retry-After of a 429)"""
+        with self._lock:
+            key = (provider, model)
+            self._paused_until[key] = max(self._paused_until.get(key, 0.0), time.monotonic() + seconds)
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """The limiter shared by all the clients of the process"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter()
+    return _rate_limiter
+
+
+# ==================== Helpers ====================
+
+def estimate_tokens(request: Dict) -> float:
+    """Token cost of a request, ~4 characters per token (prompt) + max_tokens (completion)"""
+    if "messages" in request:
+        characters = sum(len(str(message.get("content") or "")) for message in request["messages"])
+        return characters / 4 + (request.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+    texts = request.get("input", "")
+    if isinstance(texts, str):
+        texts = [texts]
+    return sum(len(str(text)) for text in texts) / 4
+
+
+def is_rate_limit_error(error: Optional[BaseException]) -> bool:
+    return error is not None and getattr(error, "status_code", None) == 429
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Retry-After of a 429 response (retry-after-ms, retry-after in seconds or as an HTTP date)"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+_exponential = wait_exponential(min=1, max=10)
+
+
+def wait_for_retry(retry_state) -> float:
+    """
+    tenacity wait : no blind backoff after a 429 of a rate limited client, the limiter already holds
+    the next call until the Retry-After (or for one second without it). Exponential backoff for the
+    other errors, and for the 429 of clients outside the limiter (e.g. injected clients).
+    """
+    error = retry_state.outcome.exception() if retry_state.outcome is not None else None
+    if error is not None and getattr(error, "limiter_paused", False):
+        return 0.0
+    return _exponential(retry_state)
+
+
+# ==================== Client wrapper ====================
+
+class _LimitedCompletions:
+
+    def __init__(self, owner: "RateLimitedClient"):
+        self.owner = owner
+
+    def create(self, **kwargs):
+        create = self.owner.client.chat.completions.create
+        return self.owner.call(create, kwargs, settle=not kwargs.get("stream"))
+
+
+class _LimitedEmbeddings:
+
+    def __init__(self, owner: "RateLimitedClient"):
+        self.owner = owner
+
+    def create(self, **kwargs):
+        return self.owner.call(self.owner.client.embeddings.create, kwargs, settle=True)
+
+
+class RateLimitedClient:
+    """
+    OpenAI / Together compatible client (sync or async) whose chat completions and embeddings
+    go through the process-wide limiter. Every other attribute is the wrapped client's.
+    """
+
+    def __init__(self, client, provider: str, is_async: bool = False, limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            client: OpenAI / Together client (AsyncOpenAI / AsyncTogether with is_async)
+            provider: "openai" or "together" (quota of PROVIDER_LIMITS)
+            is_async: the wrapped client is an async client
+            limiter: limiter to use (default: the process-wide one)
+        """
+        self.client = client
+        self.provider = provider
+        self.is_async = is_async
+        self.limiter = limiter or get_rate_limiter()
+        self.chat = SimpleNamespace(completions=_LimitedCompletions(self))
+        self.embeddings = _LimitedEmbeddings(self)
+
+    def __getattr__(self, name: str):
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def call(self, create, request: Dict, settle: bool):
+        if self.is_async:
+            return self._acall(create, request, settle)
+
+        model = request.get("model") or "default"
+        tokens = estimate_tokens(request)
+        self.limiter.acquire(self.provider, model, tokens)
+        try:
+            response = create(**request)
+        except Exception as e:
+            self._on_error(model, e)
+            raise
+        if settle:
+            self.limiter.settle(self.provider, model, tokens, getattr(response, "usage", None))
+        return response
+
+    async def _acall(self, create, request: Dict, settle: bool):
+        model = request.get("model") or "default"
+        tokens = estimate_tokens(request)
+        await self.limiter.aacquire(self.provider, model, tokens)
+        try:
+            response = await create(**request)
+        except Exception as e:
+            self._on_error(model, e)
+            raise
+        if settle:
+            self.limiter.settle(self.provider, model, tokens, getattr(response, "usage", None))
+        return response
+
+    def _on_error(self, model: str, error: Exception):
+        if is_rate_limit_error(error):
+            retry_after = retry_after_seconds(error)
+            self.limiter.pause(self.provider, model, retry_after if retry_after is not None else 1.0)
+            # The next attempt waits in the limiter, see wait_for_retry
+            error.limiter_paused = True
+
+
+def rate_limited(client, provider: str, is_async: bool = False) -> RateLimitedClient:
+    """Wrap an OpenAI ("openai") or Together ("together") client in the shared limiter"""
+    return RateLimitedClient(client, provider, is_async=is_async)
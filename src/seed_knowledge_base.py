@@ -1,54 +1,307 @@
+import argparse
+import hashlib
+import json
 import os
+import threading
+from typing import Callable, Dict, List, Optional
 from dotenv import load_dotenv
-from openai import OpenAI
-from supabase import create_client
+from src import clients
+from src.batch_embeddings import Progress, embed_batches
+from src.config import EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, EMBEDDING_DIMENSIONS, UPSERT_CHUNK_SIZE
 
 load_dotenv()
 
-# Initialize clients
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
-
 EMBEDDING_MODEL = "text-embedding-3-small"
 
 
-def generate_embedding(text: str) -> list[float]:
-    """Generate embedding vector using OpenAI API"""
-    response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=text)
-    return response.data[0].embedding
-
-
 def prepare_text(article: dict) -> str:
     """Combine article fields for embedding"""
     keywords = ", ".join(article.get("keywords", []))
     return f"Title: {article['title']}\nCategory: {article['category']}\nContent: {article['content']}\nKeywords: {keywords}"
 
 
-def seed_kb(articles: list[dict]):
-    """Insert articles with embeddings into Supabase"""
-    # Clear existing articles
-    supabase.table("kb_articles").delete().neq("id", -1).execute()
-    
-    for article in articles:
-        # Generate embedding
-        embedding = generate_embedding(prepare_text(article))
-        
-        # Insert into Supabase
-        record = {
-            "kb_id": article["kb_id"],
-            "title": article["title"],
-            "category": article["category"],
-            "content": article["content"],
-            "keywords": article.get("keywords", []),
-            "avg_resolution_time": article.get("avg_resolution_time"),
-            "success_rate": article.get("success_rate"),
-            "related_articles": article.get("related_articles", []),
-            "embedding": embedding
-        }
-        supabase.table("kb_articles").insert(record).execute()
+def content_hash(article: dict, embedding_model: str = EMBEDDING_MODEL, dimensions: Optional[int] = EMBEDDING_DIMENSIONS) -> str:
+    """Hash of an article (every field) and of the embedding model / size : it changes when the stored row must be rewritten"""
+    stored = {"embedding_model": embedding_model, "article": article}
+    if dimensions:
+        stored["dimensions"] = dimensions
+    payload = json.dumps(stored, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_record(article: dict, embedding: List[float], dimensions: Optional[int] = EMBEDDING_DIMENSIONS) -> dict:
+    """kb_articles row of an article"""
+    return {
+        "kb_id": article["kb_id"],
+        "title": article["title"],
+        "category": article["category"],
+        "content": article["content"],
+        "keywords": article.get("keywords", []),
+        "avg_resolution_time": article.get("avg_resolution_time"),
+        "success_rate": article.get("success_rate"),
+        "related_articles": article.get("related_articles", []),
+        "content_hash": content_hash(article, EMBEDDING_MODEL, dimensions),
+        "embedding": embedding
+    }
+
+
+def diff_articles(
+    articles: List[dict],
+    existing: Dict[str, Optional[str]],
+    embedding_model: str = EMBEDDING_MODEL,
+    dimensions: Optional[int] = EMBEDDING_DIMENSIONS
+) -> Dict[str, List]:
+    """
+    Changes to apply to a store holding `existing` ({kb_id: content_hash})
+
+    Returns:
+        Dict with the added, changed and unchanged articles and the deleted kb_ids
+    """
+    diff = {"added": [], "changed": [], "unchanged": [], "deleted": []}
+    # The last occurrence of a kb_id wins, as with the upserts
+    by_id = {article["kb_id"]: article for article in articles}
+    for kb_id, article in by_id.items():
+        if kb_id not in existing:
+            diff["added"].append(article)
+        elif existing[kb_id] != content_hash(article, embedding_model, dimensions):
+            diff["changed"].append(article)
+        else:
+            diff["unchanged"].append(article)
+    diff["deleted"] = [kb_id for kb_id in existing if kb_id not in by_id]
+    return diff
+
+
+def _sync(
+    label: str,
+    articles: List[dict],
+    existing: Dict[str, Optional[str]],
+    openai_client,
+    embedding_model: str,
+    dimensions: Optional[int],
+    text: Callable[[dict], str],
+    write: Callable[[List[dict], List[List[float]]], None],
+    delete: Callable[[List[str]], None],
+    full: bool,
+    batch_size: int,
+    concurrency: int
+) -> Dict:
+    """Embed and write the added / changed articles (all of them with full), then delete the removed ones"""
+    diff = diff_articles(articles, existing, embedding_model, dimensions)
+    pending = diff["added"] + diff["changed"] + (diff["unchanged"] if full else [])
+    progress = Progress(label, len(pending))
+
+    def on_batch(indices: List[int], embeddings: List[List[float]]):
+        write([pending[i] for i in indices], embeddings)
+        progress.update(len(indices))
+
+    if pending:
+        embed_batches(
+            openai_client,
+            embedding_model,
+            [text(article) for article in pending],
+            on_batch=on_batch,
+            max_inputs=batch_size,
+            concurrency=concurrency,
+            dimensions=dimensions
+        )
+    # After the upserts : the store is never empty, and never misses an article still listed
+    if diff["deleted"]:
+        delete(diff["deleted"])
+
+    report = progress.summary()
+    report.update({key: len(value) for key, value in diff.items()})
+    return report
+
+
+def fetch_supabase_hashes(supabase, page_size: int = 1000) -> Dict[str, Optional[str]]:
+    """{kb_id: content_hash} of the kb_articles rows (paginated, PostgREST caps the rows of a response)"""
+    hashes = {}
+    start = 0
+    while True:
+        rows = (
+            supabase.table("kb_articles")
+            .select("kb_id, content_hash")
+            .order("kb_id")
+            .range(start, start + page_size - 1)
+            .execute()
+            .data
+        )
+        hashes.update({row["kb_id"]: row.get("content_hash") for row in rows})
+        if len(rows) < page_size:
+            return hashes
+        start += page_size
+
+
+def sync_kb(
+    articles: List[dict],
+    openai_client=None,
+    supabase=None,
+    full: bool = False,
+    dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    chunk_size: int = UPSERT_CHUNK_SIZE
+) -> Dict:
+    """
+    Incremental sync of the Supabase knowledge base : only the articles whose content hash differs
+    from the stored one are re-embedded and upserted, the rows of removed articles are deleted last
+
+    Args:
+        articles: articles the table must hold
+        openai_client / supabase: clients to use (default: the shared clients)
+        full: rewrite every article (the embeddings already computed come from the embedding cache)
+        dimensions: shortened embeddings (the embedding column must have this size)
+        batch_size / concurrency: embeddings requests
+        chunk_size: rows per bulk upsert / delete
+
+    Returns:
+        Dict with count (articles written), seconds, per_second and the added / changed / unchanged / deleted counts
+    """
+    openai_client = openai_client or clients.openai_client(os.getenv("OPENAI_API_KEY"))
+    supabase = supabase or clients.supabase_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+    def write(batch: List[dict], embeddings: List[List[float]]):
+        records = [build_record(article, embedding, dimensions) for article, embedding in zip(batch, embeddings)]
+        for start in range(0, len(records), chunk_size):
+            supabase.table("kb_articles").upsert(records[start:start + chunk_size], on_conflict="kb_id").execute()
+
+    def delete(kb_ids: List[str]):
+        for start in range(0, len(kb_ids), chunk_size):
+            supabase.table("kb_articles").delete().in_("kb_id", kb_ids[start:start + chunk_size]).execute()
+
+    return _sync(
+        "Synced", articles, fetch_supabase_hashes(supabase), openai_client, EMBEDDING_MODEL, dimensions,
+        prepare_text, write, delete, full, batch_size, concurrency
+    )
+
+
+def seed_kb(
+    articles: List[dict],
+    openai_client=None,
+    supabase=None,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    chunk_size: int = UPSERT_CHUNK_SIZE
+) -> Dict:
+    """
+    Rewrite every article of the Supabase knowledge base (sync_kb with full=True) : batched embeddings
+    requests, `concurrency` of them in flight, bulk upserts of chunk_size rows as each batch is embedded.
+    The rows of articles no longer listed are deleted at the end, the table is never cleared.
+    """
+    return sync_kb(
+        articles, openai_client=openai_client, supabase=supabase, full=True,
+        batch_size=batch_size, concurrency=concurrency, chunk_size=chunk_size
+    )
+
+
+def sync_chroma(
+    collection,
+    articles: List[dict],
+    openai_client=None,
+    embedding_model: str = EMBEDDING_MODEL,
+    full: bool = False,
+    dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    chunk_size: int = UPSERT_CHUNK_SIZE
+) -> Dict:
+    """Same as sync_kb for a ChromaDB collection, the content hash is kept in the metadata (the writes are serialized)"""
+    openai_client = openai_client or clients.openai_client(os.getenv("OPENAI_API_KEY"))
+    write_lock = threading.Lock()
+
+    stored = collection.get(include=["metadatas"])
+    existing = {
+        kb_id: (metadata or {}).get("content_hash")
+        for kb_id, metadata in zip(stored["ids"], stored["metadatas"] or [None] * len(stored["ids"]))
+    }
+
+    def write(batch: List[dict], embeddings: List[List[float]]):
+        with write_lock:
+            for start in range(0, len(batch), chunk_size):
+                chunk = batch[start:start + chunk_size]
+                collection.upsert(
+                    ids=[article["kb_id"] for article in chunk],
+                    documents=[article["content"] for article in chunk],
+                    metadatas=[chroma_metadata(article, embedding_model, dimensions) for article in chunk],
+                    embeddings=embeddings[start:start + chunk_size]
+                )
+
+    def delete(kb_ids: List[str]):
+        with write_lock:
+            for start in range(0, len(kb_ids), chunk_size):
+                collection.delete(ids=kb_ids[start:start + chunk_size])
+
+    return _sync(
+        "Synced", articles, existing, openai_client, embedding_model, dimensions,
+        chroma_text, write, delete, full, batch_size, concurrency
+    )
+
+
+def populate_chroma(
+    collection,
+    articles: List[dict],
+    openai_client=None,
+    embedding_model: str = EMBEDDING_MODEL,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    chunk_size: int = UPSERT_CHUNK_SIZE
+) -> Dict:
+    """Rewrite every article of a ChromaDB collection (sync_chroma with full=True)"""
+    return sync_chroma(
+        collection, articles, openai_client=openai_client, embedding_model=embedding_model, full=True,
+        batch_size=batch_size, concurrency=concurrency, chunk_size=chunk_size
+    )
+
+
+def chroma_collection_name(dimensions: Optional[int] = EMBEDDING_DIMENSIONS) -> str:
+    """ChromaDB collection of an embedding size (a collection only holds vectors of one size)"""
+    return f"kb_articles_{dimensions}" if dimensions else "kb_articles"
+
+
+def chroma_text(article: dict) -> str:
+    """Text embedded for an article of the ChromaDB collection"""
+    return f"{article['title']} {article['category']} {' '.join(article.get('keywords', []))} {article['content']}"
+
+
+def chroma_metadata(article: dict, embedding_model: str = EMBEDDING_MODEL, dimensions: Optional[int] = EMBEDDING_DIMENSIONS) -> dict:
+    return {
+        "kb_id": article["kb_id"],
+        "title": article["title"],
+        "category": article["category"],
+        "keywords": ",".join(article.get("keywords", [])),
+        "avg_resolution_time": article.get("avg_resolution_time", "N/A"),
+        "success_rate": article.get("success_rate", "N/A"),
+        "content_hash": content_hash(article, embedding_model, dimensions)
+    }
 
 
 if __name__ == "__main__":
-    from data.knowledge_base import KB_ARTICLES
-    seed_kb(KB_ARTICLES)
-    print(f" Seeded {len(KB_ARTICLES)} articles")
\ No newline at end of file
+    from src.data.knowledge_base import KB_ARTICLES
+
+    parser = argparse.ArgumentParser(description="Sync the Supabase knowledge base with KB_ARTICLES")
+    parser.add_argument("--full", action="store_true", help="rewrite every article instead of the changed ones")
+    parser.add_argument("--chroma-path", default=None, help="also sync the ChromaDB collection of this directory")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="texts per embeddings request")
+    parser.add_argument("--concurrency", type=int, default=EMBEDDING_CONCURRENCY, help="embeddings requests in flight")
+    parser.add_argument("--chunk-size", type=int, default=UPSERT_CHUNK_SIZE, help="rows per bulk upsert")
+    args = parser.parse_args()
+    options = {"full": args.full, "batch_size": args.batch_size, "concurrency": args.concurrency, "chunk_size": args.chunk_size}
+
+    def summary(store: str, report: Dict) -> str:
+        return (
+            f" {store}: {report['added']} added, {report['changed']} changed, {report['deleted']} deleted, "
+            f"{report['unchanged']} unchanged - {report['count']} written in {report['seconds']:.1f}s"
+        )
+
+    print(summary("Supabase", sync_kb(KB_ARTICLES, **options)))
+
+    if args.chroma_path:
+        import chromadb
+        from chromadb.config import Settings
+        from src.config import EMBEDDING_MODEL as CHROMA_EMBEDDING_MODEL
+
+        collection = chromadb.PersistentClient(
+            path=args.chroma_path,
+            settings=Settings(anonymized_telemetry=False, allow_reset=True)
+        ).get_or_create_collection(name=chroma_collection_name())
+        print(summary("ChromaDB", sync_chroma(collection, KB_ARTICLES, embedding_model=CHROMA_EMBEDDING_MODEL, **options)))
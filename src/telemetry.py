@@ -0,0 +1,166 @@
+from typing import Dict, Iterator, List, Optional
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import asdict, dataclass, field
+import json
+import threading
+import time
+
+
+@dataclass
+class Span:
+    """One timed call"""
+    name: str
+    kind: str                      # llm | embedding | vector_query | rerank | safety | tool
+    start: float                   # epoch seconds
+    duration_ms: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    retries: int = 0
+    error: Optional[str] = None
+    attributes: Dict = field(default_factory=dict)
+
+
+class Trace:
+    """
+    Spans of one ticket analysis, shared by the threads / tasks working on it. The trace is
+    found through the current context, so the tools do not need to know which ticket they serve.
+    """
+
+    def __init__(self, ticket_id: Optional[str] = None):
+        self.ticket_id = ticket_id
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dicts(self) -> List[Dict]:
+        with self._lock:
+            return [{"ticket_id": self.ticket_id, **asdict(span)} for span in self.spans]
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_attempt: ContextVar[Optional[int]] = ContextVar("current_attempt", default=None)
+
+
+@contextmanager
+def trace(ticket_id: Optional[str] = None) -> Iterator[Trace]:
+    """Record the spans of the current context (and of the threads/tasks it starts) in a new trace"""
+    current = Trace(ticket_id)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+def before_attempt(retry_state):
+    """tenacity `before` hook : the next span records the number of retries of this attempt"""
+    _current_attempt.set(retry_state.attempt_number)
+
+
+@contextmanager
+def span(name: str, kind: str, **attributes) -> Iterator[Span]:
+    """
+    Time a call and record it in the current trace (no-op outside of a trace).
+    The span is marked with the error if the call raises.
+    """
+    attempt = _current_attempt.get()
+    if attempt is not None:
+        _current_attempt.set(None)
+
+    current = Span(
+        name=name,
+        kind=kind,
+        start=time.time(),
+        retries=(attempt or 1) - 1,
+        attributes=attributes
+    )
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - started) * 1000
+        active = _current_trace.get()
+        if active is not None:
+            active.add(current)
+
+
+def record_usage(current: Span, usage) -> Span:
+    """Copy the token usage of an API response (response.usage) on the span"""
+    if usage is None:
+        return current
+
+    current.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+    current.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is not None:
+        current.cached_tokens += getattr(details, "cached_tokens", 0) or 0
+    return current
+
+
+@contextmanager
+def timed(timings: Dict[str, float], name: str) -> Iterator[None]:
+    """Store the wall time (ms) of the block in timings[name]"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit running fn in a copy of the current context (the trace follows the work)"""
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+# ==================== Exporters ====================
+
+def to_jsonl(spans: List[Dict]) -> str:
+    """One JSON object per span"""
+    return "\n".join(json.dumps(span, default=str) for span in spans)
+
+
+def to_prometheus(spans: List[Dict], prefix: str = "itsupport") -> str:
+    """
+    Prometheus text exposition of the spans, aggregated by span name and kind :
+    call/error/retry counters, total duration and token counters.
+    """
+    totals = defaultdict(lambda: defaultdict(float))
+    for item in spans:
+        key = (item["name"], item["kind"])
+        totals[key]["calls"] += 1
+        totals[key]["errors"] += 1 if item.get("error") else 0
+        totals[key]["retries"] += item.get("retries", 0)
+        totals[key]["duration_seconds"] += item.get("duration_ms", 0.0) / 1000
+        totals[key]["prompt_tokens"] += item.get("prompt_tokens", 0)
+        totals[key]["completion_tokens"] += item.get("completion_tokens", 0)
+        totals[key]["cached_tokens"] += item.get("cached_tokens", 0)
+
+    metrics = [
+        ("calls", "counter", "Number of calls"),
+        ("errors", "counter", "Number of failed calls"),
+        ("retries", "counter", "Number of retried attempts"),
+        ("duration_seconds", "counter", "Total wall time of the calls"),
+        ("prompt_tokens", "counter", "Prompt tokens"),
+        ("completion_tokens", "counter", "Completion tokens"),
+        ("cached_tokens", "counter", "Cached prompt tokens"),
+    ]
+
+    lines = []
+    for metric, metric_type, help_text in metrics:
+        full_name = f"{prefix}_span_{metric}_total"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        for (name, kind), values in sorted(totals.items()):
+            value = values[metric]
+            value_text = f"{value:.6f}" if metric == "duration_seconds" else str(int(value))
+            lines.append(f'{full_name}{{name="{name}",kind="{kind}"}} {value_text}')
+    return "\n".join(lines) + "\n"
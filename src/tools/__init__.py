@@ -1,13 +1,38 @@
-from .ticket_categorizer import TicketCategorizer
-from .chromaembeddings_kb_searcher import ChromaDBVectorKBSearcher
-from .priority_scorer import PriorityScorer
-from .supabase_vector_kb_searcher import SupabaseVectorKBSearcher
-from .safety_checker import SafetyChecker
+import importlib
+
+from .registry import LazyTools, default_tools
+
+# The tool modules import heavy clients (chromadb, supabase, together, sentence_transformers) :
+# they are only imported when a tool class is first accessed (PEP 562 module __getattr__)
+_TOOL_MODULES = {
+    "TicketCategorizer": ".ticket_categorizer",
+    "CentroidCategorizer": ".centroid_categorizer",
+    "ChromaDBVectorKBSearcher": ".chromaembeddings_kb_searcher",
+    "PriorityScorer": ".priority_scorer",
+    "SupabaseVectorKBSearcher": ".supabase_vector_kb_searcher",
+    "SafetyChecker": ".safety_checker",
+}
 
 __all__ = [
     "TicketCategorizer",
+    "CentroidCategorizer",
     "ChromaDBVectorKBSearcher", 
     "PriorityScorer",
     "SupabaseVectorKBSearcher",
-    "SafetyChecker"
-]
\ No newline at end of file
+    "SafetyChecker",
+    "LazyTools",
+    "default_tools"
+]
+
+
+def __getattr__(name: str):
+    module = _TOOL_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,103 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+from src.data.knowledge_base import KB_ARTICLES
+
+
+def article_text(article: Dict) -> str:
+    """Text embedded for a KB article (same fields as the seeding script)"""
+    keywords = ", ".join(article.get("keywords", []))
+    return f"Title: {article['title']}\nCategory: {article['category']}\nContent: {article['content']}\nKeywords: {keywords}"
+
+
+def ticket_text(ticket: Dict) -> str:
+    """Text embedded for a ticket (same as the agent's ticket_text)"""
+    return f"{ticket['subject']}\n{ticket['description']}"
+
+
+class CentroidCategorizer:
+    """
+    Local ticket classifier : cosine similarity of the ticket embedding to one centroid per
+    category, the mean of the normalized embeddings of its KB articles (and labelled tickets).
+    The margin between the best and the second best category tells how clear the decision is.
+    """
+
+    def __init__(
+        self,
+        categories: Sequence[str],
+        articles: Optional[List[Dict]] = None,
+        labelled_tickets: Optional[List[Dict]] = None,
+        temperature: float = 0.05
+    ):
+        """
+        Args:
+            categories: categories to choose from
+            articles: labelled KB articles (default: KB_ARTICLES)
+            labelled_tickets: tickets with a "category" (or "expected_category") label, optional
+            temperature: softmax temperature of the similarities, for the reported confidence
+        """
+        self.categories = list(categories)
+        self.temperature = temperature
+
+        self.examples = []  # (text, category)
+        for article in (KB_ARTICLES if articles is None else articles):
+            self.examples.append((article_text(article), article["category"]))
+        for ticket in labelled_tickets or []:
+            self.examples.append((ticket_text(ticket), ticket.get("category") or ticket["expected_category"]))
+        self.examples = [(text, category) for text, category in self.examples if category in self.categories]
+
+        # KB keywords of each category, reported as keywords_detected
+        self.keywords = {category: set() for category in self.categories}
+        for article in (KB_ARTICLES if articles is None else articles):
+            if article["category"] in self.keywords:
+                self.keywords[article["category"]].update(keyword.lower() for keyword in article.get("keywords", []))
+
+        self.centroids: Optional[np.ndarray] = None  # (n_categories, dimension), unit rows
+
+    @property
+    def fitted(self) -> bool:
+        return self.centroids is not None
+
+    def example_texts(self) -> List[str]:
+        """Texts to embed (in this order) for fit"""
+        return [text for text, _ in self.examples]
+
+    def fit(self, embeddings: Sequence[Sequence[float]]):
+        """Build the centroids from the embeddings of example_texts()"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        labels = np.array([category for _, category in self.examples])
+
+        centroids = np.zeros((len(self.categories), vectors.shape[1]), dtype=np.float32)
+        for i, category in enumerate(self.categories):
+            members = vectors[labels == category]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[i] = centroid / np.linalg.norm(centroid)
+        self.centroids = centroids
+
+    def classify(self, embedding: Sequence[float], text: str = "") -> Dict:
+        """
+        Nearest centroid of a ticket embedding
+
+        Returns:
+            Dict with category, confidence (0-100), similarity, margin (over the runner-up),
+            runner_up, keywords_detected (KB keywords of the category found in text)
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        similarities = self.centroids @ (vector / np.linalg.norm(vector))
+
+        order = np.argsort(similarities)[::-1]
+        best, second = int(order[0]), int(order[1])
+        weights = np.exp((similarities - similarities[best]) / self.temperature)
+
+        category = self.categories[best]
+        lowered = text.lower()
+        return {
+            "category": category,
+            "confidence": int(round(100 * weights[best] / weights.sum())),
+            "similarity": float(similarities[best]),
+            "margin": float(similarities[best] - similarities[second]),
+            "runner_up": self.categories[second],
+            "keywords_detected": sorted(keyword for keyword in self.keywords[category] if keyword in lowered)
+        }
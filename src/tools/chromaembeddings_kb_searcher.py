@@ -1,58 +1,136 @@
 from typing import Dict, List, Optional
-from openai import OpenAI
+import threading
 import chromadb
 from chromadb.config import Settings
-from src.config import OPENAI_API_KEY, EMBEDDING_MODEL, SIMILARITY_THRESHOLD
+from tenacity import retry, stop_after_attempt
+from src.clients import openai_client
+from src.batch_embeddings import embedding_request
+from src.config import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, EMBEDDING_QUANTIZATION, RESCORE_CANDIDATES, SIMILARITY_THRESHOLD
 from src.data.knowledge_base import KB_ARTICLES
+from src.seed_knowledge_base import chroma_collection_name, sync_chroma
+from src.rate_limiter import wait_for_retry
+from src.telemetry import span, record_usage, before_attempt, timed
+from src.vector_index import QuantizedIndex
 
 
 class ChromaDBVectorKBSearcher:
     
-    def __init__(self, chroma_path: str = "./chroma_db"):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(
+        self,
+        chroma_path: str = "./chroma_db",
+        client=None,
+        chroma_client=None,
+        sync: bool = True,
+        quantization: str = EMBEDDING_QUANTIZATION,
+        rescore_candidates: int = RESCORE_CANDIDATES
+    ):
+        """
+        Args:
+            chroma_path: persistent ChromaDB directory
+            client: OpenAI compatible client for the embeddings (default: the shared OpenAI client)
+            chroma_client: ChromaDB client (default: PersistentClient on chroma_path)
+            sync: bring the collection up to date with KB_ARTICLES (only the changed articles are re-embedded)
+            quantization: "int8" or "binary" searches an in-memory QuantizedIndex of the collection
+                (rescoring the top rescore_candidates at full precision), "none" queries ChromaDB
+            rescore_candidates: candidates rescored at full precision
+        """
+        self.client = client or openai_client()
         self.embedding_model = EMBEDDING_MODEL
+        self.dimensions = EMBEDDING_DIMENSIONS
+        self.quantization = quantization
+        self.rescore_candidates = rescore_candidates
         self.name = "search_knowledge_base"
         
-        self.chroma_client = chromadb.PersistentClient(
+        # Quantized indexes by category (None: all the articles), built from the collection on first query
+        self._indexes: Optional[Dict[Optional[str], tuple]] = None
+        self._index_lock = threading.Lock()
+        
+        self.chroma_client = chroma_client or chromadb.PersistentClient(
             path=chroma_path,
             settings=Settings(anonymized_telemetry=False, allow_reset=True)
         )
-        self.collection = self.chroma_client.get_or_create_collection(name="kb_articles")
+        # One collection per embedding size, the one synced by `python -m src.seed_knowledge_base --chroma-path`
+        self.collection = self.chroma_client.get_or_create_collection(name=chroma_collection_name(self.dimensions))
         
-        if self.collection.count() == 0:
-            self._populate()
+        if sync:
+            self._sync()
     
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
     def _get_embedding(self, text: str) -> List[float]:
-        response = self.client.embeddings.create(model=self.embedding_model, input=text)
+        with span("embedding", "embedding", model=self.embedding_model) as sp:
+            response = self.client.embeddings.create(**embedding_request(self.embedding_model, text, self.dimensions))
+            record_usage(sp, response.usage)
         return response.data[0].embedding
     
-    def _populate(self):
-        ids, documents, metadatas, embeddings = [], [], [], []
-        
-        for article in KB_ARTICLES:
-            text = f"{article['title']} {article['category']} {' '.join(article.get('keywords', []))} {article['content']}"
-            
-            ids.append(article["kb_id"])
-            documents.append(article["content"])
-            embeddings.append(self._get_embedding(text))
-            metadatas.append({
-                "kb_id": article["kb_id"],
-                "title": article["title"],
-                "category": article["category"],
-                "keywords": ",".join(article.get("keywords", [])),
-                "avg_resolution_time": article.get("avg_resolution_time", "N/A"),
-                "success_rate": article.get("success_rate", "N/A")
-            })
-        
-        self.collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+    def _sync(self):
+        """Add / update / delete the articles whose content hash differs from KB_ARTICLES"""
+        sync_chroma(
+            self.collection,
+            KB_ARTICLES,
+            openai_client=self.client,
+            embedding_model=self.embedding_model,
+            dimensions=self.dimensions
+        )
+        self._indexes = None
+    
+    def _load_indexes(self) -> Dict[Optional[str], tuple]:
+        """(QuantizedIndex, rows) of all the articles and of each category, rows are (id, document, metadata)"""
+        if self._indexes is None:
+            with self._index_lock:
+                if self._indexes is None:
+                    stored = self.collection.get(include=["embeddings", "documents", "metadatas"])
+                    rows = list(zip(stored["ids"], stored["documents"], stored["metadatas"]))
+                    groups: Dict[Optional[str], List[int]] = {None: list(range(len(rows)))}
+                    for i, (_, _, metadata) in enumerate(rows):
+                        groups.setdefault(metadata["category"], []).append(i)
+                    indexes = {}
+                    for category, members in groups.items():
+                        if not members:
+                            continue
+                        index = QuantizedIndex(
+                            [stored["embeddings"][i] for i in members],
+                            quantization=self.quantization,
+                            rescore=self.rescore_candidates
+                        )
+                        indexes[category] = (index, [rows[i] for i in members])
+                    self._indexes = indexes
+        return self._indexes
+    
+    def _query_index(self, query_embedding: List[float], n_results: int, category: Optional[str]) -> Dict:
+        """Search of the quantized index, in the shape of collection.query (squared L2 distances of unit vectors)"""
+        entry = self._load_indexes().get(category)
+        matches = entry[0].search(query_embedding, k=n_results) if entry is not None else []
+        rows = [entry[1][i] for i, _ in matches]
+        return {
+            "ids": [[row[0] for row in rows]],
+            "documents": [[row[1] for row in rows]],
+            "metadatas": [[row[2] for row in rows]],
+            "distances": [[2.0 - 2.0 * similarity for _, similarity in matches]]
+        }
+    
+    def warmup(self, load_index: bool = False) -> Dict[str, float]:
+        """Open the OpenAI connection and, with load_index, run one query on the collection"""
+        timings = {}
+        with timed(timings, "openai_connection"):
+            self.client.models.list()
+        if load_index:
+            with timed(timings, "kb_index"):
+                self.collection.query(query_embeddings=[self._get_embedding("warmup")], n_results=1)
+        return timings
     
     def execute(self, ticket_text: str, category: Optional[str] = None) -> Dict:
-        results = self.collection.query(
-            query_embeddings=[self._get_embedding(ticket_text)],
-            n_results=10,
-            where={"category": category} if category else None,
-            include=["documents", "metadatas", "distances"]
-        )
+        query_embedding = self._get_embedding(ticket_text)
+        with span("vector_query", "vector_query", backend="chromadb", category=category, quantization=self.quantization) as sp:
+            if self.quantization != "none":
+                results = self._query_index(query_embedding, 10, category)
+            else:
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=10,
+                    where={"category": category} if category else None,
+                    include=["documents", "metadatas", "distances"]
+                )
+            sp.attributes["results"] = len(results['ids'][0])
         
         articles = []
         for i in range(len(results['ids'][0])):
@@ -0,0 +1,139 @@
+from typing import Dict, List, Optional, Tuple
+import re
+
+# Features of the PriorityScorer guidelines : (name, level, weight, pattern). The weights add up to
+# the rule score of a ticket, each feature counts once.
+FEATURES = [
+    # CRITICAL : system down, multiple users blocked, security breach
+    ("outage", "critical", 4.0, r"\b(system|server|site|network|service)s? (is |are )?(down|offline|unreachable)\b|\boutage\b"),
+    ("blast_radius", "critical", 3.0, r"\b(all|multiple|several|many) (users|employees|people|staff)\b|\bnobody (can|is able)\b|\b(entire|whole) (\d+(st|nd|rd|th) )?(floor|team|office|company|department|building)\b"),
+    ("security", "critical", 4.0, r"\b(security )?breach\b|\bhacked\b|\bransomware\b|\bmalware\b|\bcompromised\b|\bphishing\b"),
+    # HIGH : user blocked, deadline mentioned, client impact
+    ("urgency", "high", 2.0, r"\burgent(ly)?\b|\basap\b|\bemergency\b|\bright now\b"),
+    ("deadline", "high", 2.0, r"\bin \d+ (minutes?|mins?|hours?)\b|\bdeadline\b|\bby (noon|eod|end of (the )?day|tomorrow)\b|\bpresentation\b|\bcalls? all day\b"),
+    ("blocked", "high", 1.5, r"\b(can'?t|cannot|unable to) (log ?in|login|access|work|sign in)\b|\blocked out\b|\bwon'?t (turn on|power on|connect)\b|\bnot receiving\b"),
+    ("client_impact", "high", 1.5, r"\b(client|customer)s? (meeting|calls?|emails?|impact|demo|presentation)s?\b|\bcustomers? (can'?t|cannot|are)\b"),
+    # MEDIUM : degraded performance, workaround exists (no weight, they only allow a MEDIUM decision)
+    ("degraded", "medium", 0.0, r"\bslow(ly|ness)?\b|\bfreez(e|es|ing)\b|\bcrash(es|ing)?\b|\bkeeps? (dropping|disconnecting|crashing)\b|\bdisconnects\b|\bflicker(s|ing)?\b|\blag(gy|ging)?\b|\bintermittent(ly)?\b|\bcrawling\b"),
+    ("workaround", "medium", 0.0, r"\bworkaround\b|\btemporarily\b|\bfor now\b|\bin the meantime\b"),
+    # LOW : questions, feature requests, "when you have time"
+    ("no_rush", "low", -4.0, r"\bwhen(ever)? you (have|get) (the )?(time|a chance)\b|\bno rush\b|\bnot urgent\b|\blow priority\b|\bno hurry\b"),
+    ("question", "low", -2.0, r"\bhow (do|can) i\b|\bjust wondering\b|\bquick question\b|\bfeature request\b|\bwould (it )?be nice\b|\bis it possible\b"),
+]
+
+# Prior of each category (a password or access problem usually blocks the user)
+CATEGORY_PRIORS = {
+    "PASSWORD_ACCESS": 1.0,
+    "NETWORK_CONNECTIVITY": 0.5,
+    "EMAIL_ISSUES": 0.0,
+    "SOFTWARE_ISSUES": 0.0,
+    "HARDWARE_PROBLEMS": 0.0,
+}
+
+RESPONSE_TIMES = {"CRITICAL": "< 15 min", "HIGH": "< 1 hour", "MEDIUM": "< 4 hours", "LOW": "< 24 hours"}
+
+# Score bands decided by the rules, the scores in between are left to the LLM
+CRITICAL_MIN_SCORE = 6.0  # and at least one "critical" feature (below it, a critical feature goes to the LLM)
+HIGH_MIN_SCORE = 4.0
+HIGH_MAX_SCORE = 5.0  # above it, stacked high signals (urgent + client calls all day...) may be CRITICAL
+MEDIUM_MAX_SCORE = 2.0  # and at least one "medium" feature, no "high" or "critical" one
+LOW_MAX_SCORE = -2.0
+
+_COMPILED = [(name, level, weight, re.compile(pattern, re.IGNORECASE)) for name, level, weight, pattern in FEATURES]
+
+
+class PriorityRules:
+    """
+    Rule-based priority of a ticket : the weighted features of the guidelines (urgency lexicon,
+    deadline / time expressions, blast radius, security, degraded performance, workaround,
+    "when you have time") plus a category prior. Clear scores are decided here, the ambiguous
+    band goes to the LLM.
+    """
+
+    def __init__(
+        self,
+        critical_min: float = CRITICAL_MIN_SCORE,
+        high_min: float = HIGH_MIN_SCORE,
+        high_max: float = HIGH_MAX_SCORE,
+        medium_max: float = MEDIUM_MAX_SCORE,
+        low_max: float = LOW_MAX_SCORE
+    ):
+        self.critical_min = critical_min
+        self.high_min = high_min
+        self.high_max = high_max
+        self.medium_max = medium_max
+        self.low_max = low_max
+
+    @staticmethod
+    def score(ticket_text: str, category: Optional[str] = None) -> Tuple[float, List[Tuple[str, str, str]]]:
+        """Rule score and the matched features (name, level, matched text)"""
+        total = CATEGORY_PRIORS.get(category, 0.0)
+        matched = []
+        for name, level, weight, pattern in _COMPILED:
+            match = pattern.search(ticket_text)
+            if match:
+                total += weight
+                matched.append((name, level, match.group(0)))
+        return total, matched
+
+    def decide(self, ticket_text: str, category: Optional[str] = None) -> Optional[Dict]:
+        """PriorityScorer output when the score is clear, None in the ambiguous band"""
+        total, matched = self.score(ticket_text, category)
+        levels = {level for _, level, _ in matched}
+
+        if "critical" in levels:
+            # A critical signal below the CRITICAL threshold (e.g. an outage alone) is left to the LLM
+            if total < self.critical_min:
+                return None
+            priority, distance = "CRITICAL", total - self.critical_min
+        elif total >= self.high_min:
+            if total > self.high_max:
+                return None
+            priority, distance = "HIGH", total - self.high_min
+        elif total <= self.low_max:
+            priority, distance = "LOW", self.low_max - total
+        elif total <= self.medium_max and "medium" in levels and "high" not in levels:
+            priority, distance = "MEDIUM", self.medium_max - total
+        else:
+            return None
+
+        signals = ", ".join(f"{name} ({text})" for name, _, text in matched) or "none"
+        return {
+            "priority": priority,
+            "confidence": int(min(95, 75 + 10 * distance)),
+            "response_time": RESPONSE_TIMES[priority],
+            "reasoning": f"Rule score {total:.1f} ({category or 'no category'}), signals: {signals}",
+            "rule_score": total
+        }
+
+
+def evaluate(tickets: List[Dict], rules: Optional[PriorityRules] = None) -> Dict:
+    """
+    Fast path validation on labelled tickets (expected_priority, expected_category)
+
+    Returns:
+        Dict with decided (count), coverage, accuracy (of the decided tickets) and the mismatches
+    """
+    rules = rules or PriorityRules()
+    decided, correct, mismatches = 0, 0, []
+    for ticket in tickets:
+        result = rules.decide(f"{ticket['subject']}\n{ticket['description']}", ticket.get("expected_category"))
+        if result is None:
+            continue
+        decided += 1
+        if result["priority"] == ticket["expected_priority"]:
+            correct += 1
+        else:
+            mismatches.append({
+                "id": ticket["id"],
+                "expected": ticket["expected_priority"],
+                "rules": result["priority"],
+                "reasoning": result["reasoning"]
+            })
+    return {
+        "tickets": len(tickets),
+        "decided": decided,
+        "coverage": decided / len(tickets) if tickets else 0.0,
+        "accuracy": correct / decided if decided else 0.0,
+        "mismatches": mismatches
+    }
@@ -1,8 +1,13 @@
 import os
 import json
 from typing import Dict, Optional
-from openai import OpenAI
 from dotenv import load_dotenv
+from tenacity import retry, stop_after_attempt
+from src.clients import openai_client, async_openai_client
+from src.config import ENABLE_PRIORITY_RULES
+from src.rate_limiter import wait_for_retry
+from src.telemetry import span, record_usage, before_attempt, timed
+from src.tools.priority_rules import PriorityRules
 
 load_dotenv()
 
@@ -25,15 +30,29 @@ Return valid JSON only."""
 
 
 class PriorityScorer:
+    """
+    Fast path : PriorityRules decides the clear tickets, the LLM only scores the ones in the
+    ambiguous band. The result says which one decided ("source": "rules" or "llm").
+    """
     
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, client=None, async_client=None, rules: Optional[PriorityRules] = None, use_rules: bool = ENABLE_PRIORITY_RULES):
+        """
+        Args:
+            client: OpenAI compatible client (default: the shared OpenAI client)
+            async_client: AsyncOpenAI compatible client (default: the shared one of the running event loop)
+            rules: rule scorer (default: PriorityRules with the default bands)
+            use_rules: try the rules before the LLM
+        """
+        self.client = client or openai_client(os.getenv("OPENAI_API_KEY"))
+        self.async_client = async_client  # shared client of the running event loop if not provided
         self.name = "priority_scorer"
+        self.rules = (rules or PriorityRules()) if use_rules else None
     
-    def execute(self, ticket_text: str, category: Optional[str] = None) -> Dict:
+    def _build_request(self, ticket_text: str, category: Optional[str] = None) -> Dict:
+        """Chat completion arguments shared by execute and aexecute"""
         prompt = f"[Category: {category}]\n{ticket_text}" if category else ticket_text
         
-        response = self.client.chat.completions.create(
+        return dict(
             model=os.getenv("MODEL_NAME"),
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
@@ -41,16 +60,62 @@ class PriorityScorer:
             ],
             temperature=0.1
         )
-        
-        
-        result = json.loads(response.choices[0].message.content)
+    
+    def _parse_response(self, content: str) -> Dict:
+        result = json.loads(content)
        
         return {
             "priority": result.get("priority", "MEDIUM"),
             "confidence": result.get("confidence", 50),
             "response_time": result.get("response_time", "< 4 hours"),
-            "reasoning": result.get("reasoning", "")
+            "reasoning": result.get("reasoning", ""),
+            "source": "llm"
         }
     
+    def _rules_result(self, ticket_text: str, category: Optional[str]) -> Optional[Dict]:
+        """Priority of the rules, None when the ticket is in the ambiguous band (or rules disabled)"""
+        if self.rules is None:
+            return None
+        with span("priority.rules", "classifier") as sp:
+            result = self.rules.decide(ticket_text, category)
+            sp.attributes.update(decided=result is not None)
+        if result is None:
+            return None
+        return {**result, "source": "rules"}
+    
+    def warmup(self) -> Dict[str, float]:
+        """Open the connection to the API (TLS handshake) before the first ticket"""
+        timings = {}
+        with timed(timings, "connection"):
+            self.client.models.list()
+        return timings
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
+    def execute(self, ticket_text: str, category: Optional[str] = None) -> Dict:
+        result = self._rules_result(ticket_text, category)
+        if result is not None:
+            return result
+        
+        with span("llm.priority", "llm", model=os.getenv("MODEL_NAME")) as sp:
+            response = self.client.chat.completions.create(**self._build_request(ticket_text, category))
+            record_usage(sp, response.usage)
+        
+        return self._parse_response(response.choices[0].message.content)
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
+    async def aexecute(self, ticket_text: str, category: Optional[str] = None) -> Dict:
+        """Async version of execute, using the async OpenAI client"""
+        result = self._rules_result(ticket_text, category)
+        if result is not None:
+            return result
+        
+        client = self.async_client or async_openai_client(os.getenv("OPENAI_API_KEY"))
+        
+        with span("llm.priority", "llm", model=os.getenv("MODEL_NAME")) as sp:
+            response = await client.chat.completions.create(**self._build_request(ticket_text, category))
+            record_usage(sp, response.usage)
+        
+        return self._parse_response(response.choices[0].message.content)
+    
     def format_output(self, result: Dict) -> str:
         return f"Priority: {result['priority']} | Response: {result['response_time']}"
\ No newline at end of file
@@ -0,0 +1,54 @@
+from typing import Callable, Dict, Iterator, List
+from collections.abc import Mapping
+import threading
+
+
+class LazyTools(Mapping):
+    """
+    Tools by name, each one built on first access : a run that never searches the KB never
+    creates the Supabase client nor loads the cross-encoder. The names (and their order) are
+    known up front, so the agents can list the available tools without building them.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[], object]]):
+        self._factories = dict(factories)
+        self._tools: Dict[str, object] = {}
+        self._locks = {name: threading.Lock() for name in self._factories}
+
+    def __getitem__(self, name: str):
+        tool = self._tools.get(name)
+        if tool is not None:
+            return tool
+
+        factory = self._factories[name]
+        # One lock per tool : a slow construction (model load) does not block the other tools
+        with self._locks[name]:
+            tool = self._tools.get(name)
+            if tool is None:
+                tool = factory()
+                self._tools[name] = tool
+        return tool
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def __contains__(self, name) -> bool:
+        return name in self._factories
+
+    def built(self) -> List[str]:
+        """Names of the tools already constructed"""
+        return [name for name in self._factories if name in self._tools]
+
+
+def default_tools() -> LazyTools:
+    """Tools of the agents : categorizer, Supabase KB searcher and priority scorer"""
+    from src import tools
+
+    return LazyTools({
+        "ticket_categorizer": lambda: tools.TicketCategorizer(),
+        "search_knowledge_base": lambda: tools.SupabaseVectorKBSearcher(),
+        "calculate_priority": lambda: tools.PriorityScorer()
+    })
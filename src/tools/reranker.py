@@ -1,6 +1,5 @@
 from typing import List, Dict
-from sentence_transformers import CrossEncoder
-import numpy as np
+from src.telemetry import span, timed
 
 
 class Reranker:
@@ -8,17 +7,29 @@ class Reranker:
     Reranks search results using cross-encoder
     """
     
-    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", model=None):
         """
         Initialize reranker
         
         Args:
             model_name: Cross-encoder model to use : ms-marco-MiniLM-L-6-v2
+            model: already loaded scorer with a predict(pairs) method (replaces the cross-encoder)
         """
         
-        self.model = CrossEncoder(model_name)
+        if model is None:
+            # Imported here : sentence_transformers (torch) takes seconds to import
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name)
+        self.model = model
         print(f"Reranker loaded!")
     
+    def warmup(self) -> Dict[str, float]:
+        """One dummy rerank : the first inference pays for the lazy initialisations of the model"""
+        timings = {}
+        with timed(timings, "rerank"):
+            self.rerank("warmup query", [{"title": "Warmup", "content": "warmup document"}], top_k=1)
+        return timings
+    
     def rerank(
         self, 
         query: str, 
@@ -47,7 +58,8 @@ class Reranker:
             pairs.append([query, doc_text])
         
         # Get reranking scores
-        scores = self.model.predict(pairs)
+        with span("rerank", "rerank", documents=len(pairs)):
+            scores = self.model.predict(pairs)
         
         # Add rerank scores to articles
         for i, article in enumerate(articles):
@@ -1,7 +1,9 @@
 import os
 from typing import Dict, List, Optional
-from together import Together
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, stop_after_attempt
+from src.clients import together_client, async_together_client
+from src.rate_limiter import wait_for_retry
+from src.telemetry import span, record_usage, before_attempt, timed
 
 
 class SafetyChecker:
@@ -28,7 +30,9 @@ class SafetyChecker:
     def __init__(
         self, 
         together_api_key: str = None,
-        model: str = "meta-llama/Meta-Llama-Guard-3-8B"
+        model: str = "meta-llama/Meta-Llama-Guard-3-8B",
+        client=None,
+        async_client=None
     ):
         """
         Initialize safety checker
@@ -36,19 +40,29 @@ class SafetyChecker:
         Args:
             together_api_key: Together AI API key (or from env)
             model: Llama Guard model to use
+            client: Together compatible client (default: the shared Together client of the API key)
+            async_client: AsyncTogether compatible client (default: the shared one of the running event loop)
         """
         self.api_key = together_api_key or os.getenv("TOGETHER_API_KEY")
         
-        if not self.api_key:
+        if not self.api_key and client is None:
             raise ValueError("TOGETHER_API_KEY not found in .env")
         
-        self.client = Together(api_key=self.api_key)
+        self.client = client or together_client(self.api_key)
+        self.async_client = async_client  # shared client of the running event loop if not provided
         self.model = model
         
         print(f"Safety Checker initialized ")
         print("_" * 60)
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
+    def warmup(self) -> Dict[str, float]:
+        """Open the connection to the Together API (TLS handshake) before the first ticket"""
+        timings = {}
+        with timed(timings, "connection"):
+            self.client.models.list()
+        return timings
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
     def check_safety(
         self, 
         text: str, 
@@ -67,6 +81,29 @@ class SafetyChecker:
                 - category: str (if unsafe)
                 - raw_response: str
         """
+        with span("safety_check", "safety", model=self.model, role=role) as sp:
+            response = self.client.chat.completions.create(**self._build_request(text, role))
+            record_usage(sp, response.usage)
+        
+        return self._parse_response(response.choices[0].message.content, role)
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
+    async def acheck_safety(
+        self, 
+        text: str, 
+        role: str = "Agent"  
+    ) -> Dict:
+        """Async version of check_safety, using the async Together client"""
+        client = self.async_client or async_together_client(self.api_key)
+        
+        with span("safety_check", "safety", model=self.model, role=role) as sp:
+            response = await client.chat.completions.create(**self._build_request(text, role))
+            record_usage(sp, response.usage)
+        
+        return self._parse_response(response.choices[0].message.content, role)
+    
+    def _build_request(self, text: str, role: str) -> Dict:
+        """Llama Guard 3 request arguments shared by the sync and async checks"""
         # Build prompt for Llama Guard 3
         # there are special tokens for the Meta model (Llama Guard 3)
         prompt = f"""<|begin_of_text|><|start_header_id|>user<|end_header_id|>
@@ -100,16 +137,16 @@ Provide your safety assessment for {role} in the above conversation:
 - First line must read 'safe' or 'unsafe'.
 - If unsafe, a second line must include a comma-separated list of violated categories.<|eot_id|><|start_header_id|>assistant<|end_header_id|>"""
 
-        # Call Llama Guard 3
-        response = self.client.chat.completions.create(
+        return dict(
             model=self.model,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
             max_tokens=100
         )
-        
+    
+    def _parse_response(self, content: str, role: str) -> Dict:
         # Parse response
-        result = response.choices[0].message.content.strip()
+        result = content.strip()
         lines = result.split('\n')
         
         is_safe = lines[0].lower() == 'safe'
@@ -133,6 +170,14 @@ Provide your safety assessment for {role} in the above conversation:
         """Check safety of agent output"""
         return self.check_safety(agent_text, role="Agent")
     
+    async def acheck_user_input(self, user_text: str) -> Dict:
+        """Async check of user input"""
+        return await self.acheck_safety(user_text, role="User")
+    
+    async def acheck_agent_output(self, agent_text: str) -> Dict:
+        """Async check of agent output"""
+        return await self.acheck_safety(agent_text, role="Agent")
+    
     def format_safety_warning(self, safety_result: Dict) -> str:
         """Format a user-friendly safety warning"""
         if safety_result["is_safe"]:
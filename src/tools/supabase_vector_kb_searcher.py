@@ -1,9 +1,14 @@
 from typing import Dict, List, Optional
+import asyncio
 import os
-from openai import OpenAI
-from supabase import create_client
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, stop_after_attempt
 from src.tools.reranker import Reranker  
+from src import clients
+from src.batch_embeddings import embedding_request
+from src.config import EMBEDDING_DIMENSIONS, EMBEDDING_QUANTIZATION, RESCORE_CANDIDATES
+from src.rate_limiter import wait_for_retry
+from src.telemetry import span, record_usage, before_attempt, timed
+from src.vector_index import QUANTIZATIONS
 
 
 class SupabaseVectorKBSearcher:
@@ -15,50 +20,167 @@ class SupabaseVectorKBSearcher:
         supabase_key: str = None,
         openai_api_key: str = None,
         embedding_model: str = None,
-        use_reranking: bool = True  
+        use_reranking: bool = True,
+        speculative_overfetch: int = 5,
+        supabase_client=None,
+        openai_client=None,
+        reranker: Optional[Reranker] = None,
+        dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+        quantization: str = EMBEDDING_QUANTIZATION,
+        rescore_candidates: int = RESCORE_CANDIDATES
     ):
-        """Initialize Supabase vector searcher with reranking"""
+        """
+        Initialize Supabase vector searcher with reranking
+        
+        Args:
+            supabase_client / openai_client: already created clients (default: the shared clients of the credentials)
+            reranker: already loaded Reranker (default: the cross-encoder is loaded)
+            dimensions: shortened query embeddings (the size of the embedding column)
+            quantization: "binary" searches the sign bits of the embeddings (match_kb_articles_binary) and
+                rescores the top rescore_candidates at full precision, "none" uses match_kb_articles.
+                pgvector has no int8 type : "int8" falls back to match_kb_articles (full precision, with a warning)
+        """
         self.name = "search_knowledge_base"
+        self.speculative_overfetch = speculative_overfetch
         
         # Get credentials from env if not provided
         self.supabase_url = supabase_url or os.getenv("SUPABASE_URL")
         self.supabase_key = supabase_key or os.getenv("SUPABASE_KEY")
         self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
         self.embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-
+        self.dimensions = dimensions
+        self.quantization = quantization
+        self.rescore_candidates = rescore_candidates
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        if quantization == "int8":
+            print(" EMBEDDING_QUANTIZATION=int8 is not supported by pgvector, searching at full precision (use binary)")
+        self.match_function = "match_kb_articles_binary" if quantization == "binary" else "match_kb_articles"
         
         # Initialize clients
-        self.supabase = create_client(self.supabase_url, self.supabase_key)
-        self.openai_client = OpenAI(api_key=self.openai_api_key)
+        self.supabase = supabase_client or clients.supabase_client(self.supabase_url, self.supabase_key)
+        self.openai_client = openai_client or clients.openai_client(self.openai_api_key)
+        
+        # Async clients (None: the shared ones of the running event loop)
+        self.async_supabase = None
+        self.async_openai_client = None
         
      
         
         # Initialize reranker
         self.use_reranking = use_reranking
         if self.use_reranking:
-            self.reranker = Reranker()
+            self.reranker = reranker or Reranker()
         
         print(f" Supabase Vector KB Searcher initialized")
         print(f"   Model: {self.embedding_model}")
         print(f"   Reranking: {' Enabled' if self.use_reranking else 'Disabled'}")
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
     def _get_embedding(self, text: str) -> List[float]:
         """
         Generate embedding using OpenAI API
         """
-        response = self.openai_client.embeddings.create(
-            model=self.embedding_model,
-            input=text
-        )
+        with span("embedding", "embedding", model=self.embedding_model) as sp:
+            response = self.openai_client.embeddings.create(
+                **embedding_request(self.embedding_model, text, self.dimensions)
+            )
+            record_usage(sp, response.usage)
         return response.data[0].embedding
     
+    def _match_params(
+        self,
+        query_embedding: List[float],
+        match_count: int,
+        category: Optional[str],
+        min_similarity: float
+    ) -> Dict:
+        params = {
+            "query_embedding": query_embedding,
+            "match_threshold": min_similarity,
+            "match_count": match_count,  
+            "filter_category": category
+        }
+        if self.match_function == "match_kb_articles_binary":
+            params["rescore_count"] = max(self.rescore_candidates, match_count)
+        return params
+    
+    def _match(
+        self,
+        query_embedding: List[float],
+        match_count: int,
+        category: Optional[str] = None,
+        min_similarity: float = 0.5
+    ) -> List[Dict]:
+        """Call the Supabase vector search and format the matched articles"""
+        with span("vector_query", "vector_query", match_count=match_count, category=category, function=self.match_function) as sp:
+            result = self.supabase.rpc(
+                self.match_function,
+                self._match_params(query_embedding, match_count, category, min_similarity)
+            ).execute()
+            sp.attributes["results"] = len(result.data)
+        
+        return [self._format_article(article) for article in result.data]
+    
+    @staticmethod
+    def _format_article(article: Dict) -> Dict:
+        """Format a row returned by match_kb_articles"""
+        return {
+            "kb_id": article["kb_id"],
+            "title": article["title"],
+            "category": article["category"],
+            "content": article["content"][:200] + "...",
+            "full_content": article["content"],
+            "similarity_score": float(article["similarity"]),
+            "keywords": article.get("keywords", []),
+            "avg_resolution_time": article.get("avg_resolution_time", "N/A"),
+            "success_rate": article.get("success_rate", "N/A"),
+            "related_articles": article.get("related_articles", [])
+        }
+    
+    def prefetch(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_similarity: float = 0.5
+    ) -> Dict:
+        """
+        Speculative search : unfiltered, over-fetched query that only needs the ticket text.
+        It can run while the ticket is still being categorized, the category filter is applied
+        locally afterwards (see search(candidates=...)).
+        
+        Returns:
+            Dict with the query embedding, the candidate articles and whether the candidates
+            are exhaustive (fewer matches than requested above the similarity threshold)
+        """
+        match_count = top_k * 3 * self.speculative_overfetch
+        query_embedding = self._get_embedding(query)
+        articles = self._match(query_embedding, match_count, None, min_similarity)
+        
+        return {
+            "embedding": query_embedding,
+            "articles": articles,
+            "exhaustive": len(articles) < match_count
+        }
+    
+    @staticmethod
+    def _filter_candidates(candidates: Dict, category: Optional[str], initial_k: int) -> List[Dict]:
+        return [
+            dict(article) for article in candidates["articles"]
+            if category is None or article["category"] == category
+        ][:initial_k]
+    
+    @staticmethod
+    def _needs_filtered_query(candidates: Dict, articles: List[Dict], top_k: int) -> bool:
+        return len(articles) < top_k and not candidates["exhaustive"]
+    
     def search(
         self,
         query: str,
         top_k: int = 3, 
         category: Optional[str] = None,
-        min_similarity: float = 0.5
+        min_similarity: float = 0.5,
+        candidates: Optional[Dict] = None
     ) -> List[Dict]:
         """
         Search KB with reranking
@@ -68,6 +190,7 @@ class SupabaseVectorKBSearcher:
             top_k: Number of results to return
             category: Category to filter by
             min_similarity: Minimum similarity score to return
+            candidates: Result of prefetch(), filtered locally instead of querying Supabase again
         
         Returns:
             List of articles"""
@@ -75,35 +198,17 @@ class SupabaseVectorKBSearcher:
         # Step 1: Get more results from Supabase for reranking
         initial_k = top_k * 3 if self.use_reranking else top_k  
         
-        # Generate query embedding
-        query_embedding = self._get_embedding(query)
-        
-        # Call Supabase
-        result = self.supabase.rpc(
-            "match_kb_articles",
-            {
-                "query_embedding": query_embedding,
-                "match_threshold": min_similarity,
-                "match_count": initial_k,  
-                "filter_category": category
-            }
-        ).execute()
-        
-        # Format results
-        articles = []
-        for article in result.data:
-            articles.append({
-                "kb_id": article["kb_id"],
-                "title": article["title"],
-                "category": article["category"],
-                "content": article["content"][:200] + "...",
-                "full_content": article["content"],
-                "similarity_score": float(article["similarity"]),
-                "keywords": article.get("keywords", []),
-                "avg_resolution_time": article.get("avg_resolution_time", "N/A"),
-                "success_rate": article.get("success_rate", "N/A"),
-                "related_articles": article.get("related_articles", [])
-            })
+        if candidates is not None:
+            # Apply the category filter on the speculative candidates
+            articles = self._filter_candidates(candidates, category, initial_k)
+            
+            # Too few survivors : a filtered query could find more (reuse the embedding)
+            if self._needs_filtered_query(candidates, articles, top_k):
+                articles = self._match(candidates["embedding"], initial_k, category, min_similarity)
+        else:
+            # Generate query embedding
+            query_embedding = self._get_embedding(query)
+            articles = self._match(query_embedding, initial_k, category, min_similarity)
         
         # Step 2: Rerank 
         if self.use_reranking and articles:
@@ -113,14 +218,131 @@ class SupabaseVectorKBSearcher:
         
         return articles
     
-    def execute(self, ticket_text: str, category: Optional[str] = None) -> Dict:
+    def warmup(self, load_index: bool = False) -> Dict[str, float]:
+        """
+        Pre-pay the first search : open the OpenAI and Supabase connections, run one dummy rerank
+        and, with load_index, one real embedding + vector query (loads the index pages in Postgres)
+        """
+        timings = {}
+        with timed(timings, "openai_connection"):
+            self.openai_client.models.list()
+        with timed(timings, "supabase_connection"):
+            self.supabase.table("kb_articles").select("kb_id").limit(1).execute()
+        if self.use_reranking:
+            timings.update({f"reranker.{part}": ms for part, ms in self.reranker.warmup().items()})
+        if load_index:
+            with timed(timings, "kb_index"):
+                self._match(self._get_embedding("warmup"), 1)
+        return timings
+    
+    def execute(
+        self,
+        ticket_text: str,
+        category: Optional[str] = None,
+        candidates: Optional[Dict] = None
+    ) -> Dict:
         """Execute search with reranking"""
-        results = self.search(ticket_text, top_k=3, category=category)
+        results = self.search(ticket_text, top_k=3, category=category, candidates=candidates)
         
+        return self._format_output(results, candidates)
+    
+    def _format_output(self, results: List[Dict], candidates: Optional[Dict]) -> Dict:
         return {
             "articles": results,
             "count": len(results),
             "search_method": "supabase_vector_reranked" if self.use_reranking else "supabase_vector",
             "embedding_model": self.embedding_model,
-            "reranking": self.use_reranking
-        }
\ No newline at end of file
+            "reranking": self.use_reranking,
+            "speculative": candidates is not None
+        }
+    
+    # ==================== Async API ====================
+    
+    async def _get_async_clients(self):
+        """Async OpenAI/Supabase clients (the shared ones of the running event loop if not set)"""
+        openai_client = self.async_openai_client or clients.async_openai_client(self.openai_api_key)
+        supabase = self.async_supabase or await clients.async_supabase_client(self.supabase_url, self.supabase_key)
+        return openai_client, supabase
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
+    async def _aget_embedding(self, text: str) -> List[float]:
+        """Async version of _get_embedding"""
+        openai_client, _ = await self._get_async_clients()
+        with span("embedding", "embedding", model=self.embedding_model) as sp:
+            response = await openai_client.embeddings.create(
+                **embedding_request(self.embedding_model, text, self.dimensions)
+            )
+            record_usage(sp, response.usage)
+        return response.data[0].embedding
+    
+    async def _amatch(
+        self,
+        query_embedding: List[float],
+        match_count: int,
+        category: Optional[str] = None,
+        min_similarity: float = 0.5
+    ) -> List[Dict]:
+        """Async version of _match"""
+        _, supabase = await self._get_async_clients()
+        with span("vector_query", "vector_query", match_count=match_count, category=category, function=self.match_function) as sp:
+            result = await supabase.rpc(
+                self.match_function,
+                self._match_params(query_embedding, match_count, category, min_similarity)
+            ).execute()
+            sp.attributes["results"] = len(result.data)
+        
+        return [self._format_article(article) for article in result.data]
+    
+    async def aprefetch(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_similarity: float = 0.5
+    ) -> Dict:
+        """Async version of prefetch"""
+        match_count = top_k * 3 * self.speculative_overfetch
+        query_embedding = await self._aget_embedding(query)
+        articles = await self._amatch(query_embedding, match_count, None, min_similarity)
+        
+        return {
+            "embedding": query_embedding,
+            "articles": articles,
+            "exhaustive": len(articles) < match_count
+        }
+    
+    async def asearch(
+        self,
+        query: str,
+        top_k: int = 3, 
+        category: Optional[str] = None,
+        min_similarity: float = 0.5,
+        candidates: Optional[Dict] = None
+    ) -> List[Dict]:
+        """Async version of search : the cross-encoder reranking runs in a worker thread"""
+        initial_k = top_k * 3 if self.use_reranking else top_k  
+        
+        if candidates is not None:
+            articles = self._filter_candidates(candidates, category, initial_k)
+            if self._needs_filtered_query(candidates, articles, top_k):
+                articles = await self._amatch(candidates["embedding"], initial_k, category, min_similarity)
+        else:
+            query_embedding = await self._aget_embedding(query)
+            articles = await self._amatch(query_embedding, initial_k, category, min_similarity)
+        
+        if self.use_reranking and articles:
+            articles = await asyncio.to_thread(self.reranker.rerank, query, articles, top_k)
+        else:
+            articles = articles[:top_k]
+        
+        return articles
+    
+    async def aexecute(
+        self,
+        ticket_text: str,
+        category: Optional[str] = None,
+        candidates: Optional[Dict] = None
+    ) -> Dict:
+        """Async version of execute"""
+        results = await self.asearch(ticket_text, top_k=3, category=category, candidates=candidates)
+        
+        return self._format_output(results, candidates)
\ No newline at end of file
@@ -1,14 +1,45 @@
-from openai import OpenAI
-from typing import Dict, List
+from typing import Dict, List, Optional
+import asyncio
 import json
-from src.config import OPENAI_API_KEY, MODEL_NAME
+import threading
+import weakref
+from tenacity import retry, stop_after_attempt
+from src.batch_embeddings import embedding_request
+from src.clients import openai_client, async_openai_client
+from src.config import MODEL_NAME, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, ENABLE_LOCAL_CATEGORIZER, LOCAL_CATEGORIZER_MIN_MARGIN
+from src.rate_limiter import wait_for_retry
+from src.telemetry import span, record_usage, before_attempt, timed
+from src.tools.centroid_categorizer import CentroidCategorizer
 
 
 class TicketCategorizer:
+    """
+    Cascade : the ticket embedding is first compared to the category centroids of the KB
+    (CentroidCategorizer), the LLM is only called when the margin of the best category is below
+    min_margin. The result says which one decided ("source": "local" or "llm").
+    """
     
-    def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(
+        self,
+        client=None,
+        async_client=None,
+        use_local: bool = ENABLE_LOCAL_CATEGORIZER,
+        min_margin: float = LOCAL_CATEGORIZER_MIN_MARGIN,
+        labelled_tickets: Optional[List[Dict]] = None
+    ):
+        """
+        Args:
+            client: OpenAI compatible client (default: the shared OpenAI client)
+            async_client: AsyncOpenAI compatible client (default: the shared one of the running event loop)
+            use_local: try the local centroid classifier before the LLM
+            min_margin: similarity margin over the runner-up needed to skip the LLM
+            labelled_tickets: labelled tickets added to the KB articles in the centroids
+        """
+        self.client = client or openai_client()
+        self.async_client = async_client  # shared client of the running event loop if not provided
         self.model = MODEL_NAME
+        self.embedding_model = EMBEDDING_MODEL
+        self.dimensions = EMBEDDING_DIMENSIONS
         self.name = "ticket_categorizer"
         
         self.categories = [
@@ -19,10 +50,15 @@ class TicketCategorizer:
             "EMAIL_ISSUES"
         ]
         
-    def execute(self, ticket_text: str) -> Dict:
-        """
-        Classifies the ticket using a LLM : GPT-4o-mini
-        """
+        # Centroids are embedded on first use (one batched embeddings call)
+        self.local = CentroidCategorizer(self.categories, labelled_tickets=labelled_tickets) if use_local else None
+        self.min_margin = min_margin
+        self._local_lock = threading.Lock()
+        self._async_local_locks = weakref.WeakKeyDictionary()  # one asyncio.Lock per event loop
+        self._async_local_locks_guard = threading.Lock()
+        
+    def _build_request(self, ticket_text: str) -> Dict:
+        """Chat completion arguments shared by execute and aexecute"""
         prompt = f"""
         Categorize this IT support ticket into ONE of these categories:
         {', '.join(self.categories)}
@@ -39,7 +75,7 @@ class TicketCategorizer:
         }}
         """
         
-        response = self.client.chat.completions.create(
+        return dict(
             model=self.model,
             messages=[
                 {"role": "system", "content": "You are an IT ticket categorizer. Respond only with valid JSON."},
@@ -50,4 +86,114 @@ class TicketCategorizer:
             response_format={"type": "json_object"}
         )
         
-        return json.loads(response.choices[0].message.content)
\ No newline at end of file
+    def warmup(self) -> Dict[str, float]:
+        """Open the connection to the API (TLS handshake) and embed the centroids before the first ticket"""
+        timings = {}
+        with timed(timings, "connection"):
+            self.client.models.list()
+        if self.local is not None:
+            with timed(timings, "centroids"):
+                self._fit_local()
+        return timings
+    
+    # ==================== API calls ====================
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
+    def _embed(self, name: str, texts, **attributes) -> List[List[float]]:
+        """Embeddings of a text or a list of texts, recorded as the span `name`"""
+        with span(name, "embedding", model=self.embedding_model, **attributes) as sp:
+            response = self.client.embeddings.create(**embedding_request(self.embedding_model, texts, self.dimensions))
+            record_usage(sp, response.usage)
+        return [item.embedding for item in response.data]
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
+    async def _aembed(self, client, name: str, texts, **attributes) -> List[List[float]]:
+        """Async version of _embed"""
+        with span(name, "embedding", model=self.embedding_model, **attributes) as sp:
+            response = await client.embeddings.create(**embedding_request(self.embedding_model, texts, self.dimensions))
+            record_usage(sp, response.usage)
+        return [item.embedding for item in response.data]
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
+    def _llm_categorize(self, ticket_text: str) -> Dict:
+        with span("llm.categorize", "llm", model=self.model) as sp:
+            response = self.client.chat.completions.create(**self._build_request(ticket_text))
+            record_usage(sp, response.usage)
+        return {**json.loads(response.choices[0].message.content), "source": "llm"}
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_for_retry, before=before_attempt)
+    async def _allm_categorize(self, client, ticket_text: str) -> Dict:
+        """Async version of _llm_categorize"""
+        with span("llm.categorize", "llm", model=self.model) as sp:
+            response = await client.chat.completions.create(**self._build_request(ticket_text))
+            record_usage(sp, response.usage)
+        return {**json.loads(response.choices[0].message.content), "source": "llm"}
+    
+    # ==================== Local classifier ====================
+    
+    def _fit_local(self):
+        if self.local.fitted:
+            return
+        with self._local_lock:
+            if not self.local.fitted:
+                texts = self.local.example_texts()
+                self.local.fit(self._embed("embedding.centroids", texts, count=len(texts)))
+    
+    async def _afit_local(self, client):
+        if self.local.fitted:
+            return
+        loop = asyncio.get_running_loop()
+        with self._async_local_locks_guard:
+            lock = self._async_local_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            if not self.local.fitted:
+                texts = self.local.example_texts()
+                self.local.fit(await self._aembed(client, "embedding.centroids", texts, count=len(texts)))
+    
+    def _local_result(self, ticket_text: str, embedding: List[float]) -> Optional[Dict]:
+        """Categorizer output of the centroid classifier, None when the margin is too small"""
+        with span("categorize.local", "classifier") as sp:
+            local = self.local.classify(embedding, ticket_text)
+            sp.attributes.update(category=local["category"], margin=round(local["margin"], 4))
+        
+        if local["margin"] < self.min_margin:
+            return None
+        return {
+            "category": local["category"],
+            "confidence": local["confidence"],
+            "reasoning": (
+                f"Closest KB category centroid (similarity {local['similarity']:.2f}, "
+                f"margin {local['margin']:.2f} over {local['runner_up']})"
+            ),
+            "keywords_detected": local["keywords_detected"],
+            "source": "local"
+        }
+    
+    # ==================== Execution ====================
+    
+    def execute(self, ticket_text: str) -> Dict:
+        """
+        Classifies the ticket with the category centroids, or using a LLM : GPT-4o-mini when
+        the local decision is not clear
+        """
+        if self.local is not None:
+            self._fit_local()
+            embedding = self._embed("embedding.categorize", ticket_text)[0]
+            result = self._local_result(ticket_text, embedding)
+            if result is not None:
+                return result
+        
+        return self._llm_categorize(ticket_text)
+    
+    async def aexecute(self, ticket_text: str) -> Dict:
+        """Async version of execute, using the async OpenAI client"""
+        client = self.async_client or async_openai_client()
+        
+        if self.local is not None:
+            await self._afit_local(client)
+            embedding = (await self._aembed(client, "embedding.categorize", ticket_text))[0]
+            result = self._local_result(ticket_text, embedding)
+            if result is not None:
+                return result
+        
+        return await self._allm_categorize(client, ticket_text)
\ No newline at end of file
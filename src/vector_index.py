@@ -0,0 +1,119 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from src.config import EMBEDDING_QUANTIZATION, RESCORE_CANDIDATES
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+
+def normalize(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    """float32 matrix of unit rows (cosine similarity = dot product)"""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _blocked_dot(codes: np.ndarray, query: np.ndarray, block: int = 1024) -> np.ndarray:
+    """codes @ query in float32, one block of rows converted at a time (numpy has no fast int8 product)"""
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), block):
+        scores[start:start + block] = codes[start:start + block].astype(np.float32) @ query
+    return scores
+
+
+class QuantizedIndex:
+    """
+    In-memory cosine index whose vectors are scanned as compact codes : int8 (one scale per dimension,
+    calibrated on the indexed vectors) or binary (sign bits, Hamming distance). A search
+    ranks every code, then rescores the top `rescore` candidates with the full-precision vectors.
+
+    The codes are the part scanned on each query (4x smaller in int8, 32x in binary). The full-precision
+    vectors are only read for the candidates, they can be dropped (keep_full=False) when the ranking of
+    the codes is good enough.
+    """
+
+    def __init__(
+        self,
+        vectors: Sequence[Sequence[float]],
+        quantization: str = EMBEDDING_QUANTIZATION,
+        rescore: int = RESCORE_CANDIDATES,
+        keep_full: bool = True
+    ):
+        """
+        Args:
+            vectors: embeddings to index (row i is returned as index i)
+            quantization: "none" (float32), "int8" or "binary"
+            rescore: candidates rescored at full precision (0: the ranking of the codes is returned)
+            keep_full: keep the full-precision vectors (needed to rescore)
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+
+        full = normalize(vectors)
+        self.quantization = quantization
+        self.rescore = rescore if keep_full else 0
+        self.dimension = full.shape[1]
+        self.scale: Optional[np.ndarray] = None
+
+        if quantization == "none":
+            self.codes = full
+        elif quantization == "int8":
+            scale = np.abs(full).max(axis=0) / 127
+            scale[scale == 0] = 1.0
+            self.scale = scale.astype(np.float32)
+            self.codes = np.clip(np.rint(full / self.scale), -127, 127).astype(np.int8)
+        else:
+            self.codes = np.packbits(full > 0, axis=1)
+
+        self.full = full if keep_full and quantization != "none" else None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _approximate(self, query: np.ndarray) -> np.ndarray:
+        """Similarity of the query to every code (higher is closer)"""
+        if self.quantization == "none":
+            return self.codes @ query
+        if self.quantization == "int8":
+            # codes * scale approximates the vectors : fold the scale into the query
+            return _blocked_dot(self.codes, query * self.scale)
+        hamming = np.bitwise_count(self.codes ^ np.packbits(query > 0)).sum(axis=1, dtype=np.int32)
+        return 1.0 - 2.0 * hamming / self.dimension
+
+    def search(self, query: Sequence[float], k: int = 10, rescore: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        k nearest vectors of the query
+
+        Args:
+            query: query embedding
+            k: results
+            rescore: candidates rescored at full precision (default: the index setting)
+
+        Returns:
+            (index, similarity) pairs, best first. The similarity is exact for the rescored candidates
+            and approximate (from the codes) otherwise.
+        """
+        if not len(self):
+            return []
+        query = normalize(query)[0]
+        scores = self._approximate(query)
+        if self.full is None:
+            rescore = 0
+        elif rescore is None:
+            rescore = self.rescore
+
+        count = min(len(scores), max(k, rescore))
+        candidates = np.argpartition(-scores, count - 1)[:count] if count < len(scores) else np.arange(len(scores))
+        if rescore and self.full is not None:
+            candidate_scores = self.full[candidates] @ query
+        else:
+            candidate_scores = scores[candidates]
+
+        order = np.argsort(-candidate_scores)[:k]
+        return [(int(candidates[i]), float(candidate_scores[i])) for i in order]
+
+    def memory(self) -> Dict[str, int]:
+        """Bytes of the scanned codes and of the full-precision vectors kept for rescoring"""
+        codes = self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+        return {"codes": codes, "full": self.full.nbytes if self.full is not None else 0}
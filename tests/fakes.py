@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+from typing import Optional
+import asyncio
+import time
+
+from benchmarks.fake_clients import FakeOpenAI
+from src.agent.react_agent import ITSupportReActAgent
+
+TICKET = {
+    "id": "TKT-T01",
+    "subject": "VPN keeps disconnecting",
+    "description": "The VPN drops every few minutes since this morning.",
+    "user_email": "user@company.com"
+}
+
+
+class FakeTool:
+    """Tool returning a fixed observation, without prefetch / aprefetch"""
+
+    def __init__(self, observation: dict, delay: float = 0.0):
+        self.observation = observation
+        self.delay = delay
+        self.calls = []
+
+    def execute(self, **kwargs):
+        self.calls.append(kwargs)
+        time.sleep(self.delay)
+        return dict(self.observation)
+
+    async def aexecute(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        return dict(self.observation)
+
+
+def fake_tools(delay: float = 0.0) -> dict:
+    return {
+        "ticket_categorizer": FakeTool({"category": "NETWORK_CONNECTIVITY", "confidence": 90}, delay),
+        "search_knowledge_base": FakeTool({"articles": [{"kb_id": "KB-1", "title": "VPN drops", "content": "Reinstall"}]}, delay),
+        "calculate_priority": FakeTool({"priority": "MEDIUM", "response_time": "< 4 hours"}, delay)
+    }
+
+
+def make_agent(monkeypatch, mode: str, safety_checker=None, client=None, **kwargs) -> ITSupportReActAgent:
+    """Agent on the fake client and tools, with the safety checks only when a checker is given"""
+    monkeypatch.setenv("ENABLE_SAFETY_CHECK", "true" if safety_checker is not None else "false")
+    kwargs.setdefault("tools", fake_tools())
+    return ITSupportReActAgent(mode=mode, client=client or FakeOpenAI(), safety_checker=safety_checker, **kwargs)
+
+
+class RateLimitError(Exception):
+    """429 of the OpenAI SDK, with the given response headers"""
+    status_code = 429
+
+    def __init__(self, headers: Optional[dict] = None):
+        super().__init__("429 Too Many Requests")
+        self.response = SimpleNamespace(headers={"retry-after-ms": "10"} if headers is None else headers)
+
+
+class AsyncFakeOpenAI:
+    """Async facade of FakeOpenAI"""
+
+    def __init__(self):
+        self.sync = FakeOpenAI()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        return self.sync.chat.completions.create(**kwargs)
+
+
+class FakeSafetyChecker:
+    """Llama Guard stand-in flagging the ticket (flag_input) and / or the recommendation (flag_output)"""
+
+    def __init__(self, flag_input: bool = False, flag_output: bool = False, delay: float = 0.0):
+        self.flag_input = flag_input
+        self.flag_output = flag_output
+        self.delay = delay
+
+    @staticmethod
+    def _result(flagged: bool) -> dict:
+        return {
+            "is_safe": not flagged,
+            "raw_response": "unsafe\nS1" if flagged else "safe",
+            "violated_categories": ["S1"] if flagged else []
+        }
+
+    def check_user_input(self, user_text: str) -> dict:
+        return self._result(self.flag_input)
+
+    def check_agent_output(self, agent_text: str) -> dict:
+        return self._result(self.flag_output)
+
+    async def acheck_user_input(self, user_text: str) -> dict:
+        await asyncio.sleep(self.delay)
+        return self.check_user_input(user_text)
+
+    async def acheck_agent_output(self, agent_text: str) -> dict:
+        return self.check_agent_output(agent_text)
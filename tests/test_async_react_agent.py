@@ -0,0 +1,86 @@
+import asyncio
+import gc
+from types import SimpleNamespace
+
+import pytest
+from tenacity import wait_none
+
+from src.agent.async_react_agent import AsyncITSupportReActAgent
+from tests.fakes import AsyncFakeOpenAI, FakeSafetyChecker, TICKET, fake_tools
+
+
+def make_agent(monkeypatch, safety_checker=None, **kwargs) -> AsyncITSupportReActAgent:
+    monkeypatch.setenv("ENABLE_SAFETY_CHECK", "true" if safety_checker is not None else "false")
+    kwargs.setdefault("tools", fake_tools())
+    return AsyncITSupportReActAgent(client=AsyncFakeOpenAI(), safety_checker=safety_checker, **kwargs)
+
+
+def test_speculative_search_without_aprefetch_runs_the_plain_search(monkeypatch):
+    agent = make_agent(monkeypatch, speculative_search=True)
+    result = asyncio.run(agent.analyze_ticket(TICKET))
+    search = agent.tools["search_knowledge_base"]
+    assert len(search.calls) == 1
+    assert "candidates" not in search.calls[0]
+    assert result["total_steps"] == 3
+
+
+def test_flagged_ticket_discards_the_cancelled_analysis(monkeypatch):
+    agent = make_agent(monkeypatch, safety_checker=FakeSafetyChecker(flag_input=True), tools=fake_tools(delay=0.1))
+    result = asyncio.run(agent.analyze_ticket(TICKET))
+
+    recommendation = result["recommendation"]
+    assert recommendation["safety_stage"] == "input"
+    assert recommendation["category"] is None and recommendation["priority"] is None
+    assert result["total_steps"] == 0
+    assert result["reasoning_chain"] == []
+
+
+class FailingAsyncClient:
+    """Async client whose completions always fail"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        raise ConnectionError("API down")
+
+
+def run_collecting_loop_errors(coroutine):
+    """Run the coroutine, return its result and the errors reported to the loop exception handler"""
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context["message"]))
+        try:
+            return await coroutine
+        finally:
+            gc.collect()
+
+    return asyncio.run(main()), errors
+
+
+def test_failed_analysis_of_a_cancelled_caller_is_retrieved(monkeypatch):
+    monkeypatch.setattr(AsyncITSupportReActAgent._generate_final_recommendation.retry, "wait", wait_none())
+    agent = make_agent(monkeypatch, safety_checker=FakeSafetyChecker(delay=1.0))
+    agent.client = FailingAsyncClient()
+
+    async def cancelled():
+        # The analysis fails while the caller still waits for the screening
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(agent.analyze_ticket(TICKET), timeout=0.2)
+
+    _, errors = run_collecting_loop_errors(cancelled())
+    assert errors == []
+
+
+def test_cancelled_caller_stops_the_screening_and_the_analysis(monkeypatch):
+    agent = make_agent(monkeypatch, safety_checker=FakeSafetyChecker(delay=1.0), tools=fake_tools(delay=1.0))
+
+    async def cancelled():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(agent.analyze_ticket(TICKET), timeout=0.05)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    left, errors = run_collecting_loop_errors(cancelled())
+    assert left == []
+    assert errors == []
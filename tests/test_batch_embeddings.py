@@ -0,0 +1,40 @@
+from tenacity import wait_none
+
+from benchmarks.fake_clients import FakeOpenAI
+from src import batch_embeddings, telemetry
+from src.batch_embeddings import embed_batches
+
+
+class FlakyEmbeddings(FakeOpenAI):
+    """The first embeddings request fails"""
+
+    def __init__(self):
+        super().__init__()
+        self.failed = False
+        create = self.embeddings.create
+
+        def flaky_create(**kwargs):
+            if not self.failed:
+                self.failed = True
+                raise ConnectionError("connection reset")
+            return create(**kwargs)
+
+        self.embeddings.create = flaky_create
+
+
+def test_batch_spans_record_their_own_retries(monkeypatch):
+    monkeypatch.setattr(batch_embeddings._embed_batch.retry, "wait", wait_none())
+    texts = [f"text {i}" for i in range(5)]
+
+    with telemetry.trace("embed") as current:
+        embeddings = embed_batches(FlakyEmbeddings(), "text-embedding-3-small", texts, max_inputs=2, concurrency=1)
+        with telemetry.span("after", "tool"):
+            pass
+
+    assert all(embedding is not None for embedding in embeddings)
+    spans = current.to_dicts()
+    batches = [s for s in spans if s["name"] == "embedding.batch"]
+    # 3 batches + the failed attempt, only the retried one is marked
+    assert len(batches) == 4
+    assert [s["retries"] for s in batches if s["error"] is None] == [1, 0, 0]
+    assert next(s for s in spans if s["name"] == "after")["retries"] == 0
@@ -0,0 +1,24 @@
+from benchmarks.fake_clients import FakeOpenAI
+from src.cassette import Cassette
+
+REQUEST = {"model": "text-embedding-3-small", "input": "VPN keeps disconnecting"}
+
+
+def test_record_forwards_the_other_attributes(tmp_path):
+    client = FakeOpenAI()
+    with Cassette(str(tmp_path / "calls.json.gz"), mode="record") as cassette:
+        wrapped = cassette.wrap_openai(client)
+        wrapped.models.list()
+        wrapped.embeddings.create(**REQUEST)
+        assert wrapped.calls is client.calls
+    assert client.calls["embeddings"] == 1
+
+
+def test_replay_serves_the_recorded_calls_and_warmup(tmp_path):
+    path = str(tmp_path / "calls.json.gz")
+    with Cassette(path, mode="record") as cassette:
+        recorded = cassette.wrap_openai(FakeOpenAI()).embeddings.create(**REQUEST)
+
+    wrapped = Cassette(path, mode="replay").wrap_openai()
+    assert wrapped.models.list().data == []
+    assert wrapped.embeddings.create(**REQUEST).data[0].embedding == recorded.data[0].embedding
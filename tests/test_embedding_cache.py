@@ -0,0 +1,156 @@
+from types import SimpleNamespace
+import asyncio
+import sqlite3
+
+import pytest
+
+from src import embedding_cache
+from src.embedding_cache import CachedEmbeddingsClient, EmbeddingCache
+
+VECTOR = [0.1, 0.2, 0.3, 0.4]
+
+
+class FakeClock:
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_mb=1)
+    yield cache
+    cache.close()
+
+
+def test_round_trip_and_stats(cache):
+    assert cache.get_many("text-embedding-3-small", ["a"]) == [None]
+    cache.put_many("text-embedding-3-small", ["a"], [VECTOR])
+
+    assert cache.get_many("text-embedding-3-small", ["a", "b", "a"]) == [pytest.approx(VECTOR)] + [None] + [pytest.approx(VECTOR)]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_entries_are_keyed_by_model_and_dimensions(cache):
+    cache.put_many("text-embedding-3-small", ["a"], [VECTOR], dimensions=4)
+    assert cache.get_many("text-embedding-3-small", ["a"], dimensions=4)[0] is not None
+    assert cache.get_many("text-embedding-3-small", ["a"]) == [None]
+    assert cache.get_many("text-embedding-3-large", ["a"], dimensions=4) == [None]
+
+
+def test_float16_halves_the_size(tmp_path):
+    caches = {dtype: EmbeddingCache(str(tmp_path / f"{dtype}.sqlite3"), dtype=dtype) for dtype in ("float32", "float16")}
+    for cache in caches.values():
+        cache.put_many("text-embedding-3-small", ["a"], [VECTOR])
+
+    assert caches["float16"].stats()["size_mb"] * 2 == caches["float32"].stats()["size_mb"]
+    assert caches["float16"].get_many("text-embedding-3-small", ["a"])[0] == pytest.approx(VECTOR, abs=1e-3)
+    for cache in caches.values():
+        cache.close()
+
+
+def test_unknown_dtype_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), dtype="int8")
+
+
+def test_least_recently_used_vectors_are_evicted(tmp_path, clock):
+    # Room for two float32 vectors of 4 dimensions (16 bytes each)
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_mb=32 / (1024 * 1024))
+    cache.put_many("text-embedding-3-small", ["a"], [VECTOR])
+    clock.now += 1
+    cache.put_many("text-embedding-3-small", ["b"], [VECTOR])
+    clock.now += 1
+    cache.get_many("text-embedding-3-small", ["a"])
+    clock.now += 1
+    cache.put_many("text-embedding-3-small", ["c"], [VECTOR])
+
+    assert [embedding is not None for embedding in cache.get_many("text-embedding-3-small", ["a", "b", "c"])] == [True, False, True]
+    assert cache.stats()["entries"] == 2
+    cache.close()
+
+
+def test_processes_share_the_file(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    writer, reader = EmbeddingCache(path), EmbeddingCache(path)
+
+    writer.put_many("text-embedding-3-small", ["a"], [VECTOR])
+    assert reader.get_many("text-embedding-3-small", ["a"])[0] == pytest.approx(VECTOR)
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    writer.close()
+    reader.close()
+
+
+class RecordingEmbeddings:
+    """Embeddings API stand-in recording the inputs sent"""
+
+    def __init__(self):
+        self.inputs = []
+
+    def _response(self, texts):
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[float(len(text)), 1.0]) for i, text in enumerate(texts)],
+            usage=SimpleNamespace(prompt_tokens=len(texts), total_tokens=len(texts))
+        )
+
+    def create(self, input, **kwargs):
+        self.inputs.append(input)
+        return self._response(input if isinstance(input, list) else [input])
+
+    async def acreate(self, input, **kwargs):
+        return self.create(input, **kwargs)
+
+
+def test_client_sends_only_the_missing_texts(cache):
+    embeddings = RecordingEmbeddings()
+    client = CachedEmbeddingsClient(SimpleNamespace(embeddings=embeddings, models="models"), cache=cache)
+
+    first = client.embeddings.create(model="text-embedding-3-small", input=["a", "bb", "a"])
+    second = client.embeddings.create(model="text-embedding-3-small", input=["bb", "ccc"])
+
+    assert embeddings.inputs == [["a", "bb"], ["ccc"]]
+    assert [item.embedding[0] for item in first.data] == [1.0, 2.0, 1.0]
+    assert [item.embedding[0] for item in second.data] == [2.0, 3.0]
+    assert (first.cache_hits, second.cache_hits) == (0, 1)
+    assert second.usage.total_tokens == 1
+
+    third = client.embeddings.create(model="text-embedding-3-small", input="a")
+    assert len(embeddings.inputs) == 2
+    assert third.cache_hits == 1 and third.usage.total_tokens == 0
+    assert client.models == "models"
+
+
+def test_client_does_not_cache_token_arrays_or_base64(cache):
+    embeddings = RecordingEmbeddings()
+    client = CachedEmbeddingsClient(SimpleNamespace(embeddings=embeddings), cache=cache)
+
+    for _ in range(2):
+        client.embeddings.create(model="text-embedding-3-small", input=[[1, 2, 3]])
+        client.embeddings.create(model="text-embedding-3-small", input=["a"], encoding_format="base64")
+    assert len(embeddings.inputs) == 4
+    assert cache.stats()["entries"] == 0
+
+
+def test_async_client_sends_only_the_missing_texts(cache):
+    embeddings = RecordingEmbeddings()
+    client = CachedEmbeddingsClient(SimpleNamespace(embeddings=SimpleNamespace(create=embeddings.acreate)), is_async=True, cache=cache)
+
+    async def run():
+        await client.embeddings.create(model="text-embedding-3-small", input=["a", "bb"])
+        return await client.embeddings.create(model="text-embedding-3-small", input=["a", "bb"])
+
+    response = asyncio.run(run())
+    assert embeddings.inputs == [["a", "bb"]]
+    assert response.cache_hits == 2
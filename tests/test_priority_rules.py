@@ -0,0 +1,33 @@
+from src.data.sample_tickets import SAMPLE_TICKETS
+from src.tools.priority_rules import PriorityRules, evaluate
+
+
+def decided_priority(text: str, category: str = None):
+    result = PriorityRules().decide(text, category)
+    return result["priority"] if result is not None else None
+
+
+def test_critical_signal_below_threshold_goes_to_llm():
+    assert decided_priority("The file server is down") is None
+    assert decided_priority("I think my account was compromised") is None
+
+
+def test_critical_signal_above_threshold_is_critical():
+    assert decided_priority("Outage: the server is down and all users are blocked") == "CRITICAL"
+
+
+def test_medium_requires_no_high_signal():
+    assert decided_priority("Outlook is slow and I have a deadline in 2 hours") is None
+    assert decided_priority("Outlook is slow since this morning") == "MEDIUM"
+
+
+def test_stacked_high_signals_go_to_llm():
+    ticket = next(ticket for ticket in SAMPLE_TICKETS if ticket["id"] == "TKT-022")
+    text = f"{ticket['subject']}\n{ticket['description']}"
+    assert decided_priority(text, ticket["expected_category"]) is None
+
+
+def test_sample_tickets_accuracy():
+    report = evaluate(SAMPLE_TICKETS)
+    assert report["decided"] > 0
+    assert report["accuracy"] >= 0.85
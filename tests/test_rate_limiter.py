@@ -0,0 +1,203 @@
+from concurrent.futures import Future
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import asyncio
+
+import pytest
+
+from src import rate_limiter
+from src.rate_limiter import RateLimitedClient, RateLimiter, retry_after_seconds, wait_for_retry
+from tests.fakes import RateLimitError
+
+
+class FakeClock:
+    """time / asyncio stand-in : sleeping moves the clock instead of waiting"""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    async def asleep(self, seconds: float):
+        self.sleep(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=clock.monotonic, time=clock.time, sleep=clock.sleep))
+    monkeypatch.setattr(rate_limiter, "asyncio", SimpleNamespace(sleep=clock.asleep))
+    return clock
+
+
+def limiter(rpm: int, tpm: int) -> RateLimiter:
+    return RateLimiter(limits={"openai": (rpm, tpm)}, headroom=1.0)
+
+
+def test_requests_per_minute_bucket(clock):
+    limits = limiter(rpm=60, tpm=1_000_000)
+    for _ in range(60):
+        assert limits.acquire("openai", "gpt-4o-mini", 10) == 0.0
+    assert clock.slept == []
+
+    # One request back per second
+    assert limits.acquire("openai", "gpt-4o-mini", 10) == pytest.approx(1.0)
+    assert clock.slept == [pytest.approx(1.0)]
+
+
+def test_tokens_per_minute_bucket(clock):
+    limits = limiter(rpm=1000, tpm=600)
+    assert limits.acquire("openai", "gpt-4o-mini", 500) == 0.0
+    # 400 tokens missing at 10 tokens per second
+    assert limits.acquire("openai", "gpt-4o-mini", 500) == pytest.approx(40.0)
+
+
+def test_headroom_shrinks_the_buckets(clock):
+    limits = RateLimiter(limits={"openai": (10, 1_000_000)}, headroom=0.5)
+    for _ in range(5):
+        assert limits.acquire("openai", "gpt-4o-mini", 1) == 0.0
+    assert limits.acquire("openai", "gpt-4o-mini", 1) > 0
+
+
+def test_buckets_are_per_model(clock):
+    limits = limiter(rpm=1, tpm=1_000_000)
+    limits.configure("openai", "text-embedding-3-small", rpm=3, tpm=1_000_000)
+    assert limits.acquire("openai", "gpt-4o-mini", 1) == 0.0
+    for _ in range(3):
+        assert limits.acquire("openai", "text-embedding-3-small", 1) == 0.0
+    assert clock.slept == []
+
+
+def test_settle_gives_back_the_unused_tokens(clock):
+    limits = limiter(rpm=1000, tpm=600)
+    limits.acquire("openai", "gpt-4o-mini", 500)
+    limits.settle("openai", "gpt-4o-mini", 500, SimpleNamespace(total_tokens=100))
+    assert limits.acquire("openai", "gpt-4o-mini", 500) == 0.0
+
+    # A larger real usage is taken from the bucket
+    limits.settle("openai", "gpt-4o-mini", 0, SimpleNamespace(prompt_tokens=50, completion_tokens=50, total_tokens=None))
+    assert limits.acquire("openai", "gpt-4o-mini", 100) == pytest.approx(20.0)
+
+
+def test_pause_holds_the_model(clock):
+    limits = limiter(rpm=1000, tpm=1_000_000)
+    limits.pause("openai", "gpt-4o-mini", 5)
+    assert limits.acquire("openai", "gpt-4o-mini", 1) == pytest.approx(5.0)
+    assert limits.acquire("openai", "gpt-4o", 1) == 0.0
+
+
+def test_async_acquire_waits_on_the_event_loop(clock):
+    limits = limiter(rpm=1, tpm=1_000_000)
+    assert asyncio.run(limits.aacquire("openai", "gpt-4o-mini", 1)) == 0.0
+    assert asyncio.run(limits.aacquire("openai", "gpt-4o-mini", 1)) == pytest.approx(60.0)
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after-ms": "1500", "retry-after": "20"}, 1.5),
+    ({"retry-after": "20"}, 20.0),
+    ({"retry-after-ms": "soon", "retry-after": "2"}, 2.0),
+    ({"retry-after": "soon"}, None),
+    ({}, None)
+])
+def test_retry_after_headers(headers, expected):
+    assert retry_after_seconds(RateLimitError(headers)) == expected
+
+
+def test_retry_after_http_date(clock):
+    date = format_datetime(datetime.fromtimestamp(clock.now + 30, tz=timezone.utc), usegmt=True)
+    assert retry_after_seconds(RateLimitError({"retry-after": date})) == pytest.approx(30.0)
+    past = format_datetime(datetime.fromtimestamp(clock.now - 30, tz=timezone.utc), usegmt=True)
+    assert retry_after_seconds(RateLimitError({"retry-after": past})) == 0.0
+
+
+def retry_state(error: BaseException, attempt_number: int = 1) -> SimpleNamespace:
+    outcome = Future()
+    outcome.set_exception(error)
+    return SimpleNamespace(outcome=outcome, attempt_number=attempt_number)
+
+
+def test_wait_for_retry_skips_the_backoff_when_the_limiter_is_paused():
+    error = RateLimitError()
+    error.limiter_paused = True
+    assert wait_for_retry(retry_state(error, attempt_number=3)) == 0.0
+
+
+@pytest.mark.parametrize("attempt_number, expected", [(1, 1), (2, 2), (3, 4), (6, 10)])
+def test_wait_for_retry_backs_off_exponentially(attempt_number, expected):
+    assert wait_for_retry(retry_state(RateLimitError(), attempt_number)) == expected
+    assert wait_for_retry(retry_state(ConnectionError(), attempt_number)) == expected
+
+
+class FakeCompletions:
+    """Raises the given errors in turn, then answers with `total_tokens` of usage"""
+
+    def __init__(self, errors=(), total_tokens: int = 20):
+        self.errors = list(errors)
+        self.total_tokens = total_tokens
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=self.total_tokens))
+
+
+def limited_client(completions: FakeCompletions, limits: RateLimiter) -> RateLimitedClient:
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions), models="models")
+    return RateLimitedClient(client, "openai", limiter=limits)
+
+
+def test_429_pauses_the_model_for_the_retry_after(clock):
+    limits = limiter(rpm=1000, tpm=1_000_000)
+    completions = FakeCompletions([RateLimitError({"retry-after": "7"})])
+    client = limited_client(completions, limits)
+    request = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+
+    with pytest.raises(RateLimitError) as raised:
+        client.chat.completions.create(**request)
+    assert raised.value.limiter_paused
+    assert wait_for_retry(retry_state(raised.value)) == 0.0
+
+    client.chat.completions.create(**request)
+    assert clock.slept == [pytest.approx(7.0)]
+    assert client.models == "models"
+
+
+def test_429_without_retry_after_pauses_one_second(clock):
+    limits = limiter(rpm=1000, tpm=1_000_000)
+    client = limited_client(FakeCompletions([RateLimitError({})]), limits)
+    with pytest.raises(RateLimitError):
+        client.chat.completions.create(model="gpt-4o-mini", messages=[])
+    client.chat.completions.create(model="gpt-4o-mini", messages=[])
+    assert clock.slept == [pytest.approx(1.0)]
+
+
+def test_other_errors_do_not_pause(clock):
+    limits = limiter(rpm=1000, tpm=1_000_000)
+    client = limited_client(FakeCompletions([ConnectionError("reset")]), limits)
+    with pytest.raises(ConnectionError) as raised:
+        client.chat.completions.create(model="gpt-4o-mini", messages=[])
+    assert not getattr(raised.value, "limiter_paused", False)
+    client.chat.completions.create(model="gpt-4o-mini", messages=[])
+    assert clock.slept == []
+
+
+def test_client_settles_the_real_usage(clock):
+    limits = limiter(rpm=1000, tpm=600)
+    client = limited_client(FakeCompletions(total_tokens=10), limits)
+    # Estimated at max_tokens (500), settled at the 10 tokens used
+    client.chat.completions.create(model="gpt-4o-mini", messages=[], max_tokens=500)
+    client.chat.completions.create(model="gpt-4o-mini", messages=[], max_tokens=500)
+    assert clock.slept == []
@@ -0,0 +1,116 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from tenacity import wait_none
+
+from benchmarks.fake_clients import FakeOpenAI
+from src.agent.react_agent import ITSupportReActAgent
+from tests.fakes import FakeSafetyChecker, TICKET, fake_tools, make_agent
+
+
+class ActionLog:
+    """on_action / on_reset recorder : `current` holds the actions sent since the last reset"""
+
+    def __init__(self):
+        self.current = []
+        self.resets = 0
+
+    def on_action(self, action: str):
+        self.current.append(action)
+
+    def on_reset(self):
+        self.current = []
+        self.resets += 1
+
+
+class BrokenFirstStream(FakeOpenAI):
+    """The first streamed completion sends two actions of another recommendation, then fails"""
+
+    def __init__(self):
+        super().__init__()
+        self.streams = 0
+
+    def respond(self, **kwargs):
+        if not kwargs.get("stream"):
+            return super().respond(**kwargs)
+        self.streams += 1
+        if self.streams > 1:
+            return super().respond(**kwargs)
+        return self._broken_stream()
+
+    def _broken_stream(self):
+        content = json.dumps({"immediate_actions": ["Reboot the router", "Reset the VPN profile", "Call the user"]})
+        cut = content.index("Call the user")
+        delta = SimpleNamespace(content=content[:cut], role=None)
+        yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], usage=None)
+        raise ConnectionError("stream interrupted")
+
+
+def test_speculative_search_without_prefetch_runs_the_plain_search(monkeypatch):
+    agent = make_agent(monkeypatch, "parallel", speculative_search=True)
+    result = agent.analyze_ticket(TICKET)
+    search = agent.tools["search_knowledge_base"]
+    assert len(search.calls) == 1
+    assert "candidates" not in search.calls[0]
+    assert result["total_steps"] == 3
+
+
+def test_retried_stream_withdraws_the_actions_of_the_failed_attempt(monkeypatch):
+    monkeypatch.setattr(ITSupportReActAgent._stream_final_recommendation.retry, "wait", wait_none())
+    client = BrokenFirstStream()
+    agent = make_agent(monkeypatch, "static", client=client)
+    log = ActionLog()
+
+    result = agent.analyze_ticket(TICKET, on_action=log.on_action, on_reset=log.on_reset)
+
+    assert client.streams == 2
+    assert log.resets == 1
+    assert log.current == result["recommendation"]["immediate_actions"]
+
+
+def test_flagged_output_withdraws_the_streamed_actions(monkeypatch):
+    agent = make_agent(monkeypatch, "static", safety_checker=FakeSafetyChecker(flag_output=True))
+    log = ActionLog()
+
+    result = agent.analyze_ticket(TICKET, on_action=log.on_action, on_reset=log.on_reset)
+
+    assert result["recommendation"]["safety_flagged"]
+    assert log.resets == 1
+    assert log.current == result["recommendation"]["immediate_actions"]
+
+
+def test_streamed_actions_are_the_final_ones(monkeypatch):
+    agent = make_agent(monkeypatch, "static")
+    log = ActionLog()
+
+    result = agent.analyze_ticket(TICKET, on_action=log.on_action, on_reset=log.on_reset)
+
+    assert log.resets == 0
+    assert log.current == result["recommendation"]["immediate_actions"]
+
+
+@pytest.mark.parametrize("mode", ["react", "static", "parallel"])
+def test_flagged_ticket_discards_the_cancelled_analysis(monkeypatch, mode):
+    agent = make_agent(monkeypatch, mode, safety_checker=FakeSafetyChecker(flag_input=True), tools=fake_tools(delay=0.1))
+    sessions = []
+    create_session = agent.create_session
+    monkeypatch.setattr(agent, "create_session", lambda ticket: sessions.append(create_session(ticket)) or sessions[-1])
+    log = ActionLog()
+
+    result = agent.analyze_ticket(TICKET, on_action=log.on_action, on_reset=log.on_reset)
+
+    recommendation = result["recommendation"]
+    assert recommendation["safety_stage"] == "input"
+    assert recommendation["category"] is None and recommendation["priority"] is None
+    assert result["total_steps"] == 0
+    assert result["reasoning_chain"] == []
+    assert log.current == recommendation["immediate_actions"]
+
+    # The cancelled analysis stops at its next checkpoint without writing to the session
+    time.sleep(0.3)
+    assert sessions[0].observations == {}
+    assert sessions[0].reasoning_chain == []
+    assert all(len(tool.calls) <= 1 for tool in agent.tools.values())
+    assert log.current == recommendation["immediate_actions"]
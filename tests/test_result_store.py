@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.agent import react_agent, result_store
+from src.agent.react_agent import build_version_stamp, is_storable
+from src.agent.result_store import AnalysisResultStore
+from src.tools import priority_rules
+from tests.fakes import FakeTool, TICKET, fake_tools, make_agent
+
+
+class FakeClock:
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_store, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    store = AnalysisResultStore(str(tmp_path / "results.sqlite3"), ttl_seconds=60)
+    store.put("key", {"value": 1})
+
+    clock.now += 59
+    assert store.get("key") == {"value": 1}
+    clock.now += 2
+    assert store.get("key") is None
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    store = AnalysisResultStore(str(tmp_path / "results.sqlite3"), max_entries=2)
+    store.put("a", {"value": "a"})
+    clock.now += 1
+    store.put("b", {"value": "b"})
+    clock.now += 1
+    store.get("a")
+    clock.now += 1
+    store.put("c", {"value": "c"})
+
+    assert store.get("b") is None
+    assert store.get("a") == {"value": "a"}
+    assert store.get("c") == {"value": "c"}
+    assert store.stats()["entries"] == 2
+
+
+@pytest.mark.parametrize("module, name, value", [
+    (react_agent, "SIMILARITY_THRESHOLD", 0.99),
+    (react_agent, "EMBEDDING_DIMENSIONS", 256),
+    (react_agent, "EMBEDDING_QUANTIZATION", "binary"),
+    (react_agent, "ENABLE_PRIORITY_RULES", not react_agent.ENABLE_PRIORITY_RULES),
+    (priority_rules, "HIGH_MIN_SCORE", 99.0)
+])
+def test_version_stamp_follows_the_configuration(monkeypatch, module, name, value):
+    monkeypatch.setattr(react_agent, "ENABLE_PRIORITY_RULES", True)
+    stamp = build_version_stamp("static")
+    monkeypatch.setattr(module, name, value)
+    assert build_version_stamp("static") != stamp
+
+
+def test_result_of_another_version_is_not_reused(monkeypatch, tmp_path):
+    store = AnalysisResultStore(str(tmp_path / "results.sqlite3"))
+    agent = make_agent(monkeypatch, "static", result_store=store)
+    agent.analyze_ticket(TICKET)
+    assert agent.analyze_ticket(TICKET).get("cached")
+
+    monkeypatch.setattr(react_agent, "SIMILARITY_THRESHOLD", 0.99)
+    other = make_agent(monkeypatch, "static", result_store=store)
+    assert not other.analyze_ticket(TICKET).get("cached")
+
+
+def test_failed_analyses_are_not_storable():
+    ok = {"ticket_categorizer": {"category": "EMAIL_ISSUES"}}
+    assert is_storable({"immediate_actions": []}, ok)
+    assert not is_storable({"immediate_actions": []}, {**ok, "search_knowledge_base": {"error": "Supabase down"}})
+    assert not is_storable({"safety_stage": "input"}, ok)
+    assert is_storable({"safety_stage": "output"}, ok)
+
+
+def test_failed_analysis_is_not_stored(monkeypatch, tmp_path):
+    store = AnalysisResultStore(str(tmp_path / "results.sqlite3"))
+    tools = {**fake_tools(), "search_knowledge_base": FakeTool({"error": "Supabase down"})}
+    agent = make_agent(monkeypatch, "static", result_store=store, tools=tools)
+
+    agent.analyze_ticket(TICKET)
+    assert store.stats()["entries"] == 0
+    assert not agent.analyze_ticket(TICKET).get("cached")
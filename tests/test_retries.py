@@ -0,0 +1,77 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from src.rate_limiter import RateLimitedClient, RateLimiter
+from src.tools.priority_scorer import PriorityScorer
+from src.tools.ticket_categorizer import TicketCategorizer
+from tests.fakes import RateLimitError
+
+
+def completion(payload: dict) -> SimpleNamespace:
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(payload)))],
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=10, total_tokens=20)
+    )
+
+
+class FlakyCompletions:
+    """Raises one 429, then returns `payload`"""
+
+    def __init__(self, payload: dict, is_async: bool = False):
+        self.payload = payload
+        self.is_async = is_async
+        self.calls = 0
+
+    def _create(self):
+        self.calls += 1
+        if self.calls == 1:
+            raise RateLimitError()
+        return completion(self.payload)
+
+    def create(self, **kwargs):
+        if self.is_async:
+            async def create():
+                return self._create()
+            return create()
+        return self._create()
+
+
+def flaky_client(payload: dict, is_async: bool = False):
+    completions = FlakyCompletions(payload, is_async=is_async)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return RateLimitedClient(client, "openai", is_async=is_async, limiter=RateLimiter()), completions
+
+
+CATEGORY = {"category": "EMAIL_ISSUES", "confidence": 90, "reasoning": "", "keywords_detected": []}
+PRIORITY = {"priority": "LOW", "confidence": 80, "response_time": "< 24 hours", "reasoning": ""}
+
+
+def test_categorizer_retries_a_rate_limited_call():
+    client, completions = flaky_client(CATEGORY)
+    result = TicketCategorizer(client=client, use_local=False).execute("Outlook does not sync")
+    assert result["category"] == "EMAIL_ISSUES"
+    assert completions.calls == 2
+
+
+def test_async_categorizer_retries_a_rate_limited_call():
+    client, completions = flaky_client(CATEGORY, is_async=True)
+    categorizer = TicketCategorizer(client=client, async_client=client, use_local=False)
+    result = asyncio.run(categorizer.aexecute("Outlook does not sync"))
+    assert result["category"] == "EMAIL_ISSUES"
+    assert completions.calls == 2
+
+
+def test_priority_scorer_retries_a_rate_limited_call():
+    client, completions = flaky_client(PRIORITY)
+    result = PriorityScorer(client=client, use_rules=False).execute("How do I change my wallpaper?")
+    assert result["priority"] == "LOW"
+    assert completions.calls == 2
+
+
+def test_async_priority_scorer_retries_a_rate_limited_call():
+    client, completions = flaky_client(PRIORITY, is_async=True)
+    scorer = PriorityScorer(client=client, async_client=client, use_rules=False)
+    result = asyncio.run(scorer.aexecute("How do I change my wallpaper?"))
+    assert result["priority"] == "LOW"
+    assert completions.calls == 2
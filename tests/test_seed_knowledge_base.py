@@ -0,0 +1,57 @@
+import pytest
+
+from benchmarks.fake_clients import FakeOpenAI
+from src.data.knowledge_base import KB_ARTICLES
+from src.seed_knowledge_base import chroma_collection_name, sync_chroma
+
+
+class MemoryCollection:
+    """Bare ChromaDB collection: ids, documents, metadatas and embeddings in dicts"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get(self, ids=None, include=None):
+        ids = list(self.rows) if ids is None else [kb_id for kb_id in ids if kb_id in self.rows]
+        return {"ids": ids, "metadatas": [self.rows[kb_id]["metadata"] for kb_id in ids]}
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        for kb_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings):
+            self.rows[kb_id] = {"document": document, "metadata": metadata, "embedding": embedding}
+
+    def delete(self, ids):
+        for kb_id in ids:
+            self.rows.pop(kb_id, None)
+
+
+@pytest.mark.parametrize("dimensions", [None, 256])
+def test_second_sync_embeds_nothing(dimensions):
+    client = FakeOpenAI()
+    collection = MemoryCollection()
+    options = {"openai_client": client, "embedding_model": "text-embedding-3-small", "dimensions": dimensions}
+
+    first = sync_chroma(collection, KB_ARTICLES, **options)
+    assert first["added"] == len(KB_ARTICLES)
+    requests = client.calls["embeddings"]
+
+    second = sync_chroma(collection, KB_ARTICLES, **options)
+    assert second["unchanged"] == len(KB_ARTICLES)
+    assert second["added"] == second["changed"] == second["deleted"] == 0
+    assert client.calls["embeddings"] == requests
+
+
+def test_sync_embeds_only_the_changed_articles():
+    client = FakeOpenAI()
+    collection = MemoryCollection()
+    options = {"openai_client": client, "embedding_model": "text-embedding-3-small", "dimensions": 256}
+    sync_chroma(collection, KB_ARTICLES, **options)
+
+    edited = [dict(KB_ARTICLES[0], content=KB_ARTICLES[0]["content"] + " Updated.")] + list(KB_ARTICLES[1:-1])
+    report = sync_chroma(collection, edited, **options)
+    assert (report["changed"], report["deleted"], report["unchanged"]) == (1, 1, len(KB_ARTICLES) - 2)
+    assert KB_ARTICLES[-1]["kb_id"] not in collection.rows
+
+
+def test_collection_name_follows_the_embedding_size():
+    assert chroma_collection_name(None) == "kb_articles"
+    assert chroma_collection_name(512) == "kb_articles_512"
@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_clients import FakeOpenAI
+from src.agent.single_flight import SingleFlight, ticket_content_hash
+from tests.fakes import FakeTool, TICKET, fake_tools, make_agent
+
+VARIANTS = [
+    {**TICKET, "id": f"TKT-V{i:02d}", "subject": subject, "description": description}
+    for i, (subject, description) in enumerate([
+        ("VPN keeps disconnecting", "The VPN drops every few minutes since this morning."),
+        ("vpn keeps disconnecting!", "The VPN drops every few minutes since this morning"),
+        ("VPN KEEPS DISCONNECTING", "the vpn drops every few minutes, since this morning."),
+        ("VPN keeps  disconnecting", "The VPN drops every few minutes since this morning..."),
+        ("VPN keeps disconnecting?", "The VPN drops   every few minutes since this morning."),
+        ("Vpn Keeps Disconnecting", "The VPN drops every few minutes since this morning!"),
+        ("VPN keeps disconnecting.", "The VPN drops every few minutes - since this morning."),
+        (" VPN keeps disconnecting ", "The VPN drops every few minutes since this morning.\n")
+    ])
+]
+
+
+class GatedTool(FakeTool):
+    """FakeTool holding every call until `gate` is set"""
+
+    def __init__(self, observation: dict):
+        super().__init__(observation)
+        self.gate = threading.Event()
+
+    def execute(self, **kwargs):
+        assert self.gate.wait(5)
+        return super().execute(**kwargs)
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_variants_have_the_same_content_hash():
+    assert len({ticket_content_hash(ticket) for ticket in VARIANTS}) == 1
+    assert ticket_content_hash({**TICKET, "subject": "VPN is slow"}) != ticket_content_hash(TICKET)
+
+
+def test_concurrent_identical_tickets_share_one_analysis(monkeypatch):
+    client = FakeOpenAI()
+    categorizer = GatedTool({"category": "NETWORK_CONNECTIVITY", "confidence": 90})
+    agent = make_agent(
+        monkeypatch, "static", client=client, coalesce_identical=True,
+        tools={**fake_tools(), "ticket_categorizer": categorizer}
+    )
+    logs = {ticket["id"]: [] for ticket in VARIANTS}
+
+    with ThreadPoolExecutor(max_workers=len(VARIANTS)) as executor:
+        futures = [
+            executor.submit(agent.analyze_ticket, ticket, on_action=logs[ticket["id"]].append)
+            for ticket in VARIANTS
+        ]
+        # Release the leader once every other caller has joined it
+        wait_until(lambda: agent.single_flight.coalesced == len(VARIANTS) - 1)
+        categorizer.gate.set()
+        results = [future.result(timeout=5) for future in futures]
+
+    assert client.calls["chat"] == 1
+    assert len(categorizer.calls) == 1
+
+    leader = [result for result in results if "coalesced_with" not in result]
+    assert len(leader) == 1
+    actions = leader[0]["recommendation"]["immediate_actions"]
+    assert actions
+    for ticket, result in zip(VARIANTS, results):
+        assert result["ticket_id"] == ticket["id"]
+        assert result.get("coalesced_with", ticket["id"]) == leader[0]["ticket_id"]
+        # The leader streamed its actions, the joined callers get them replayed
+        assert logs[ticket["id"]] == actions
+
+
+def test_tickets_arriving_after_the_analysis_are_not_coalesced(monkeypatch):
+    client = FakeOpenAI()
+    agent = make_agent(monkeypatch, "static", client=client, coalesce_identical=True)
+
+    for ticket in VARIANTS[:2]:
+        assert "coalesced_with" not in agent.analyze_ticket(ticket)
+    assert client.calls["chat"] == 2
+    assert agent.single_flight.coalesced == 0
+
+
+def test_leader_exception_is_raised_in_every_caller():
+    single_flight = SingleFlight()
+    gate = threading.Event()
+
+    def fail():
+        assert gate.wait(5)
+        raise ConnectionError("API down")
+
+    def follow():
+        return single_flight.do("key", lambda: pytest.fail("a joined caller ran the computation"))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(single_flight.do, "key", fail)
+        wait_until(lambda: "key" in single_flight._in_flight)
+        followers = [executor.submit(follow) for _ in range(3)]
+        wait_until(lambda: single_flight.coalesced == 3)
+        gate.set()
+        for future in [leader] + followers:
+            with pytest.raises(ConnectionError):
+                future.result(timeout=5)
+
+    # Nothing kept once finished : the next call runs again
+    assert single_flight.do("key", lambda: 42) == (42, False)
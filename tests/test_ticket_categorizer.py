@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+from benchmarks.fake_clients import fake_embedding
+from src.tools.ticket_categorizer import TicketCategorizer
+
+
+class AsyncEmbeddings:
+    """Async embeddings endpoint counting the requests (lists of texts are the centroid fits)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.fits = 0
+
+    async def create(self, model: str, input, dimensions=None, **kwargs):
+        self.requests += 1
+        if isinstance(input, list):
+            self.fits += 1
+        await asyncio.sleep(0.01)
+        texts = input if isinstance(input, list) else [input]
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=fake_embedding(text, 64)) for i, text in enumerate(texts)],
+            usage=SimpleNamespace(prompt_tokens=1, completion_tokens=0, total_tokens=1)
+        )
+
+
+def test_concurrent_cold_calls_fit_the_centroids_once():
+    embeddings = AsyncEmbeddings()
+    client = SimpleNamespace(embeddings=embeddings)
+    # min_margin=0 : every ticket is decided locally, no chat call
+    categorizer = TicketCategorizer(client=client, async_client=client, min_margin=0.0)
+
+    async def run():
+        return await asyncio.gather(*(categorizer.aexecute(f"ticket {i}") for i in range(50)))
+
+    results = asyncio.run(run())
+    assert all(result["source"] == "local" for result in results)
+    assert embeddings.fits == 1
+    assert embeddings.requests == 51
+
+
+def test_fit_is_shared_across_event_loops():
+    embeddings = AsyncEmbeddings()
+    client = SimpleNamespace(embeddings=embeddings)
+    categorizer = TicketCategorizer(client=client, async_client=client, min_margin=0.0)
+
+    asyncio.run(categorizer.aexecute("first loop"))
+    asyncio.run(categorizer.aexecute("second loop"))
+    assert embeddings.fits == 1